@@ -0,0 +1,128 @@
+import argparse
+import csv
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crawl_engine
+import scrape_all
+import telemetry
+from fixture_server import COURSE_PATHS, add_fault_arguments
+from scraper_registry import UNIVERSITIES
+
+
+# end-to-end crawl benchmark: scrape_all.run() -> csvs, against fixture_server.py
+#
+# starts the fixture server in its own process, points every university's
+# links csv at it and runs the real scrape (fetch, parse pool, checkpointed
+# csv writer, telemetry), then reports:
+#   pages/s         course pages (fetched or failed) per wall-clock second
+#   fetch p50..max  per-page fetch time in ms (the attempt that was kept)
+#   failed          rows that came out empty because the page never arrived
+#   rss MB          peak resident set of the crawler, and of the biggest parse worker
+# with --refresh the scrape runs twice over one response cache, like a
+# scheduled refresh; add --churn so every page body differs between the runs
+# and the second one has to rely on the requirements memo instead of the
+# whole-page cache:
+#   memo hits       rows reused because the requirement regions were unchanged
+#
+#   python benchmarks/bench_crawl.py --pages 5000                         -> 20k pages over four sites
+#   python benchmarks/bench_crawl.py --pages 2000 --p503 0.02 --max-rps 100 --latency lognormal:150,0.8
+#   python benchmarks/bench_crawl.py --pages 500 --workers 0              -> parse on the fetch thread
+#   python benchmarks/bench_crawl.py --pages 2000 --refresh --churn
+
+
+def max_rss_mb(who):
+    # linux reports KB, macOS bytes
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def start_server(keys, args):
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixture_server.py'), *keys]
+    for name in ['pages', 'latency', 'bandwidth', 'max_rps', 'p429', 'p503', 'ptimeout', 'hang', 'crawl_delay', 'seed']:
+        command += ['--' + name.replace('_', '-'), str(getattr(args, name))]
+    for flag in ['archive', 'churn']:
+        if getattr(args, flag):
+            command.append('--' + flag)
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    return server, json.loads(server.stdout.readline())
+
+
+def count_rows(output_dir, keys):
+    # -> (rows, rows with every extracted field empty)
+    rows = empty = 0
+    for key in keys:
+        university = UNIVERSITIES[key]
+        if not os.path.exists(os.path.join(output_dir, university.output)):
+            continue   # some pages failed for good, so scrape_all kept it back for --resume
+        with open(os.path.join(output_dir, university.output), newline='', encoding='utf-8') as f:
+            for record in csv.DictReader(f):
+                rows += 1
+                empty += all(not record[field] for field in university.fields)
+    return rows, empty
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive the full scrape -> csv path against the local fixture server")
+    parser.add_argument('universities', nargs='*', help=f"default: {', '.join(sorted(COURSE_PATHS))}")
+    add_fault_arguments(parser)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="parse processes (0: on the fetch thread)")
+    parser.add_argument('--max-pending', type=int, default=crawl_engine.DEFAULT_MAX_PENDING)
+    parser.add_argument('--per-host', type=int, default=crawl_engine.DEFAULT_PER_HOST)
+    parser.add_argument('--max-per-host', type=int, default=crawl_engine.DEFAULT_MAX_PER_HOST)
+    parser.add_argument('--delay', type=float, default=0.0, help="seconds between request starts per host")
+    parser.add_argument('--retries', type=int, default=crawl_engine.DEFAULT_RETRIES)
+    parser.add_argument('--timeout', type=float, default=5.0, help="client timeout (set below --hang to see timeouts)")
+    parser.add_argument('--refresh', action='store_true', help="scrape a second time over the first run's response cache")
+    args = parser.parse_args(argv)
+
+    keys = args.universities or sorted(COURSE_PATHS)
+    server, bases = start_server(keys, args)
+    results = []
+    try:
+        for key, base in bases.items():
+            UNIVERSITIES[key] = UNIVERSITIES[key]._replace(links_url=base + '/links.csv')
+        with tempfile.TemporaryDirectory() as output_dir:
+            cache_path = os.path.join(output_dir, 'responses.sqlite')
+            for label in ['first', 'refresh'] if args.refresh else ['crawl']:
+                log = os.path.join(output_dir, f'{label}.jsonl')
+                started = time.perf_counter()
+                scrape_all.run(list(bases), use_cache=args.refresh, cache_path=cache_path, use_archive=False,
+                               output_dir=output_dir, telemetry_path=log, workers=args.workers,
+                               max_pending=args.max_pending, per_host=args.per_host, max_per_host=args.max_per_host,
+                               delay=args.delay, retries=args.retries, timeout=args.timeout, verbose=True)
+                elapsed = time.perf_counter() - started
+                worker_mb = max_rss_mb(resource.RUSAGE_CHILDREN)   # the pool's been joined; the server hasn't
+                _, empty = count_rows(output_dir, bases)
+                with open(log, encoding='utf-8') as f:
+                    events = [json.loads(line) for line in f if line.strip()]
+                results.append((label, elapsed, empty, worker_mb, events))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print()
+    print(f"{'run':<8} {'pages':>7} {'pages/s':>8} {'fetch p50':>10} {'p90':>8} {'p99':>8} {'max':>8} "
+          f"{'retried':>8} {'failed':>7} {'empty':>6} {'memo hits':>10} {'rss MB':>7} {'worker MB':>10}")
+    for label, elapsed, empty, worker_mb, events in results:
+        fetch = [event['fetch_ms'] for event in events if event.get('fetch_ms') is not None]
+        failed = sum(1 for event in events if event.get('error_class'))
+        retried = sum(1 for event in events if (event.get('attempts') or 1) > 1)
+        hits = sum(1 for event in events if event.get('memo') == 'hit')
+        cells = [telemetry.percentile(fetch, pct) for pct in (50, 90, 99)] + [max(fetch) if fetch else None]
+        print(f"{label:<8} {len(events):>7} {len(events) / elapsed:>8.1f} "
+              + ' '.join(f"{value or 0:>{width}.1f}" for value, width in zip(cells, (10, 8, 8, 8)))
+              + f" {retried:>8} {failed:>7} {empty:>6} {hits:>10} {max_rss_mb(resource.RUSAGE_SELF):>7.1f} "
+              f"{worker_mb:>10.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
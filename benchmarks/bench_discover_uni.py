@@ -0,0 +1,145 @@
+import argparse
+import csv
+import io
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import discover_uni
+from scraper_registry import UNIVERSITIES, load_extractors
+
+
+# discover_uni.py against a synthetic bulk download
+#
+# writes a zip laid out like the Discover Uni one (INSTITUTION, KISCOURSE,
+# COURSELOCATION, LOCATION, GOSALARY, LEO3, plus a wide padding table the
+# ingestion never reads) with --providers providers x --courses courses each,
+# every course listed full-time and part-time. the registered universities'
+# UKPRNs are among the providers. then, each in a fresh interpreter, it runs
+# seeds and details for the registered providers and for every provider, and
+# reports wall time and peak RSS - which should stay flat as --providers grows
+# for the registered run, and grow with the selection, not the file, for the rest.
+#
+#   python benchmarks/bench_discover_uni.py
+#   python benchmarks/bench_discover_uni.py --providers 2000 --courses 200
+
+CHILD = """
+import resource, sys, time
+sys.path.insert(0, {root!r})
+import discover_uni
+started = time.perf_counter()
+discover_uni.main({argv!r})
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print('RESULT', time.perf_counter() - started, rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024)
+"""
+
+
+def table(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerows(rows)
+    return buffer.getvalue()
+
+
+def write_bulk(path, providers, courses, seed=0):
+    rng = random.Random(seed)
+    registered = [university.ukprn for university in UNIVERSITIES.values() if university.ukprn]
+    ukprns = registered + [str(10090000 + n) for n in range(max(0, providers - len(registered)))]
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as bulk:
+        def streamed(name, header, rows):
+            # written in blocks so building a big zip doesn't need the whole table in memory either
+            with bulk.open(name, 'w') as member:
+                member.write(table([header]).encode('utf-8'))
+                block = []
+                for row in rows:
+                    block.append(row)
+                    if len(block) == 10000:
+                        member.write(table(block).encode('utf-8'))
+                        block = []
+                member.write(table(block).encode('utf-8'))
+
+        def course_rows(make):
+            for ukprn in ukprns:
+                for n in range(courses):
+                    for mode in ('1', '2'):
+                        yield make(ukprn, f"C{n:05d}", mode)
+
+        streamed('data/INSTITUTION.csv', ['PUBUKPRN', 'UKPRN', 'LEGAL_NAME', 'FIRST_TRADING_NAME', 'PROVADDRESS'],
+                 ([ukprn, ukprn, f"Provider {ukprn}", f"Provider {ukprn}", f"1 Road, Town, AB{n % 99} 1CD"]
+                  for n, ukprn in enumerate(ukprns)))
+        streamed('data/KISCOURSE.csv', ['PUBUKPRN', 'UKPRN', 'KISCOURSEID', 'KISMODE', 'TITLE', 'CRSEURL'],
+                 course_rows(lambda ukprn, kis, mode: [ukprn, ukprn, kis, mode, f"Course {kis}",
+                                                       f"https://{ukprn}.example.ac.uk/courses/{kis.lower()}-{mode}"]))
+        streamed('data/COURSELOCATION.csv', ['UKPRN', 'KISCOURSEID', 'KISMODE', 'LOCID'],
+                 course_rows(lambda ukprn, kis, mode: [ukprn, kis, mode, f"L{int(kis[1:]) % 3}"]))
+        streamed('data/LOCATION.csv', ['UKPRN', 'LOCID', 'LOCNAME', 'LATITUDE', 'LONGITUDE'],
+                 ([ukprn, f"L{n}", f"Campus {n}", f"{51 + rng.random():.5f}", f"{rng.random() - 1:.5f}"]
+                  for ukprn in ukprns for n in range(3)))
+        streamed('data/GOSALARY.csv', ['PUBUKPRN', 'UKPRN', 'KISCOURSEID', 'KISMODE', 'GOSALAGG', 'GOINSTMED'],
+                 course_rows(lambda ukprn, kis, mode: [ukprn, ukprn, kis, mode, '14',
+                                                       '' if kis.endswith('7') else str(rng.randrange(20, 45) * 1000)]))
+        streamed('data/LEO3.csv', ['PUBUKPRN', 'UKPRN', 'KISCOURSEID', 'KISMODE', 'LEO3INSTMED'],
+                 course_rows(lambda ukprn, kis, mode: [ukprn, ukprn, kis, mode, str(rng.randrange(20, 45) * 1000)]))
+        streamed('data/PADDING.csv', ['UKPRN', 'KISCOURSEID'] + [f"X{n}" for n in range(30)],
+                 course_rows(lambda ukprn, kis, mode: [ukprn, kis] + ['lorem ipsum'] * 30))
+    return ukprns
+
+
+def run(argv):
+    output = subprocess.run([sys.executable, '-c', CHILD.format(root=ROOT, argv=argv)],
+                            capture_output=True, text=True, cwd=ROOT)
+    if output.returncode != 0:
+        raise RuntimeError(output.stderr)
+    _, seconds, rss = output.stdout.strip().splitlines()[-1].split()
+    return float(seconds), float(rss)
+
+
+def check(bulk, ukprns, courses):
+    # the join keeps the full-time record and falls back to LEO3 where graduate outcomes has no median
+    files = discover_uni.BulkFiles(bulk)
+    try:
+        urls = discover_uni.course_urls(files, {ukprns[0]})
+        details = discover_uni.course_details(files, {(ukprns[0], 'C00007'), (ukprns[0], 'C00001')})
+    finally:
+        files.close()
+    assert len(urls[ukprns[0]]) == courses
+    assert urls[ukprns[0]]['C00001'].endswith('c00001-1')
+    assert details[(ukprns[0], 'C00007')][1], "no LEO3 fallback"
+    assert details[(ukprns[0], 'C00001')][2] == 'Campus 1'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time discover_uni.py on a synthetic Discover Uni download")
+    parser.add_argument('--providers', type=int, default=400)
+    parser.add_argument('--courses', type=int, default=100, help="courses per provider (each full- and part-time)")
+    args = parser.parse_args(argv)
+
+    load_extractors()
+    with tempfile.TemporaryDirectory() as directory:
+        bulk = os.path.join(directory, 'discover_uni.zip')
+        started = time.perf_counter()
+        ukprns = write_bulk(bulk, args.providers, args.courses)
+        print(f"{len(ukprns)} providers x {args.courses} courses: {os.path.getsize(bulk) / 1e6:.1f} MB zip "
+              f"in {time.perf_counter() - started:.1f}s")
+        check(bulk, ukprns, args.courses)
+
+        print(f"{'run':<28} {'seconds':>8} {'rss MB':>7}")
+        for label, argv in [
+            ('seeds, registered', ['seeds', bulk, '--out', os.path.join(directory, 'seeds')]),
+            ('details, registered', ['details', bulk, '--out', os.path.join(directory, 'details.csv')]),
+            ('seeds, all providers', ['seeds', bulk, '--all-providers', '--out', os.path.join(directory, 'all')]),
+            ('details, all providers', ['details', bulk, '--all-providers', '--out', os.path.join(directory, 'all.csv')]),
+        ]:
+            seconds, rss = run(argv)
+            print(f"{label:<28} {seconds:>8.2f} {rss:>7.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
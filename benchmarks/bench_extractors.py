@@ -0,0 +1,161 @@
+import argparse
+import glob
+import json
+import os
+import signal
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scraper_registry import UNIVERSITIES, load_extractors
+
+load_extractors()
+
+
+# micro-benchmark for the *_degree_facts extractors over the frozen pages in
+# benchmarks/fixtures/<university>/ (no network)
+#
+#   python benchmarks/bench_extractors.py                   -> report, compare to baselines.json
+#   python benchmarks/bench_extractors.py --save-baseline   -> record this machine's numbers
+#
+# exits non-zero if an extractor is slower than its baseline by more than
+# --tolerance, or if any single page takes longer than --max-page-ms (which is
+# what a catastrophically backtracking regex looks like)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, 'fixtures')
+BASELINES = os.path.join(HERE, 'baselines.json')
+
+
+class PageTimeout(BaseException):
+    # not an Exception: the extractors catch those and would return a normal (empty) row
+    pass
+
+
+def _timeout(signum, frame):
+    raise PageTimeout()
+
+
+def load_fixtures(key):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, key, '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            pages.append((os.path.basename(path), f.read()))
+    return pages
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def bench_extractor(extractor, pages, rounds, max_page_ms):
+    # warm up once so imports / first-call costs don't land in the numbers
+    for name, html in pages:
+        extractor(name, html)
+
+    timings = []
+    slowest = (0.0, None)
+    use_alarm = hasattr(signal, 'setitimer')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _timeout)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for name, html in pages:
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, max_page_ms / 1000 * 10)
+            t = time.perf_counter()
+            try:
+                extractor(name, html)
+            except PageTimeout:
+                raise RuntimeError(f"{name} did not finish within {max_page_ms * 10:.0f} ms")
+            finally:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+            elapsed = (time.perf_counter() - t) * 1000
+            timings.append(elapsed)
+            if elapsed > slowest[0]:
+                slowest = (elapsed, name)
+    total = time.perf_counter() - start
+
+    # memory gets its own pass - tracemalloc slows everything down too much to time under it
+    tracemalloc.start()
+    for name, html in pages:
+        extractor(name, html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'pages': len(timings),
+        'pages_per_sec': round(len(timings) / total, 1),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'max_ms': round(slowest[0], 3),
+        'slowest_page': slowest[1],
+        'peak_mem_kb': round(peak / 1024, 1),
+    }
+
+
+def compare(key, result, baseline, tolerance, slack_ms, max_page_ms):
+    problems = []
+    if result['max_ms'] > max_page_ms:
+        problems.append(f"{key}: {result['slowest_page']} took {result['max_ms']} ms (limit {max_page_ms} ms)")
+    if baseline:
+        for metric in ('p50_ms', 'p99_ms'):
+            limit = baseline[metric] * tolerance + slack_ms
+            if result[metric] > limit:
+                problems.append(f"{key}: {metric} {result[metric]} > {limit:.3f} "
+                                f"(baseline {baseline[metric]} x {tolerance} + {slack_ms} ms)")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the degree facts extractors on fixture pages")
+    parser.add_argument('universities', nargs='*', help="which extractors to run (default: all with fixtures)")
+    parser.add_argument('--rounds', type=int, default=20, help="passes over the fixture pages")
+    parser.add_argument('--tolerance', type=float, default=2.0, help="allowed slowdown vs baseline")
+    parser.add_argument('--slack-ms', type=float, default=1.0,
+                        help="absolute allowance on top of --tolerance, so scheduler noise on sub-ms pages doesn't fail")
+    parser.add_argument('--max-page-ms', type=float, default=250.0, help="fail if any one page is slower than this")
+    parser.add_argument('--save-baseline', action='store_true', help="write results to baselines.json")
+    args = parser.parse_args(argv)
+
+    keys = args.universities or [
+        key for key, university in sorted(UNIVERSITIES.items())
+        if university.extractor is not None and os.path.isdir(os.path.join(FIXTURES, key))
+    ]
+
+    baselines = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES) as f:
+            baselines = json.load(f)
+
+    results = {}
+    problems = []
+    print(f"{'extractor':<10} {'pages/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'peak KB':>9}  slowest page")
+    for key in keys:
+        pages = load_fixtures(key)
+        result = bench_extractor(UNIVERSITIES[key].extractor, pages, args.rounds, args.max_page_ms)
+        results[key] = result
+        print(f"{key:<10} {result['pages_per_sec']:>9} {result['p50_ms']:>8} {result['p99_ms']:>8} "
+              f"{result['peak_mem_kb']:>9}  {result['slowest_page']} ({result['max_ms']} ms)")
+        problems += compare(key, result, baselines.get(key), args.tolerance, args.slack_ms, args.max_page_ms)
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(BASELINES, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Saved baselines to {BASELINES}")
+        return 0
+
+    for problem in problems:
+        print("REGRESSION:", problem)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# import-time budget for the modules pool workers and one-off runs load
+#
+# every module is imported in a fresh interpreter (best of --rounds), with
+# sockets disabled so any import-time network call fails loudly. the scrapers
+# are what parse workers import, so they also mustn't drag in pandas, numpy,
+# requests or asyncio.
+#
+#   python benchmarks/bench_imports.py            -> table, exit 1 if anything is over budget
+#   python benchmarks/bench_imports.py --rounds 10
+
+# module -> ms
+BUDGETS = {
+    'scraper_registry': 5,
+    'telemetry': 20,
+    'rule_engine': 80,
+    'scrape_cam_degree_facts': 100,
+    'scrape_lse_degree_facts': 100,
+    'scrape_oxford_degree_facts': 100,
+    'scrape_ucl_degree_facts': 100,
+    'crawl_engine': 300,
+    'scrape_all': 350,
+}
+
+HEAVY = ['pandas', 'numpy', 'pyarrow', 'requests', 'asyncio']
+MUST_STAY_LIGHT = [module for module in BUDGETS if module.startswith('scrape_') and module != 'scrape_all']
+
+CHILD = """
+import importlib, json, socket, sys, time
+def refuse(*args, **kwargs):
+    raise RuntimeError("network access while importing")
+socket.socket.connect = refuse
+socket.getaddrinfo = refuse
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+importlib.import_module({module!r})
+ms = (time.perf_counter() - started) * 1000
+print(json.dumps({{'ms': ms, 'heavy': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def measure(module, rounds):
+    # -> (best ms, heavy modules it loaded)
+    best, heavy = None, []
+    for _ in range(rounds):
+        code = CHILD.format(root=ROOT, module=module, heavy=HEAVY)
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=ROOT)
+        if output.returncode != 0:
+            raise RuntimeError(f"importing {module} failed:\n{output.stderr}")
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        best = result['ms'] if best is None else min(best, result['ms'])
+        heavy = result['heavy']
+    return best, heavy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check import times against their budgets")
+    parser.add_argument('modules', nargs='*', help="default: every module with a budget")
+    parser.add_argument('--rounds', type=int, default=5, help="fresh interpreters per module (best is kept)")
+    args = parser.parse_args(argv)
+
+    failed = []
+    print(f"{'module':<28} {'ms':>7} {'budget':>7}  heavy imports")
+    for module in args.modules or BUDGETS:
+        ms, heavy = measure(module, args.rounds)
+        budget = BUDGETS.get(module)
+        over = budget is not None and ms > budget
+        leaky = module in MUST_STAY_LIGHT and heavy
+        print(f"{module:<28} {ms:>7.1f} {budget if budget is not None else '-':>7}  "
+              f"{', '.join(heavy) or '-'}{'  OVER BUDGET' if over else ''}{'  TOO HEAVY' if leaky else ''}")
+        if over or leaky:
+            failed.append(module)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
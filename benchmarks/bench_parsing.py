@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rule_engine
+from bench_extractors import load_fixtures, FIXTURES
+from scraper_registry import UNIVERSITIES, load_extractors
+
+load_extractors()
+
+
+# full-page parse vs region slicing (rule_engine regions) on the fixture pages
+#
+# each mode runs in its own process, so peak RSS isn't shared between them:
+#   cpu ms/page   process CPU time per extracted page
+#   rss MB        peak resident set growth while extracting (ru_maxrss, pages already loaded)
+# real course pages are much bigger than the fixtures, so --inflate repeats
+# the filler blocks (news, nav) to bring a page up to a realistic size.
+#
+#   python benchmarks/bench_parsing.py                 -> table for every university
+#   python benchmarks/bench_parsing.py oxford --inflate 40
+
+filler = re.compile(r'(?s)<aside>.*?</aside>|<header>.*?</header>')
+
+
+def inflate(html, times):
+    if times <= 1:
+        return html
+    return filler.sub(lambda match: match.group(0) * times, html)
+
+
+def max_rss_mb():
+    # linux reports KB, macOS bytes
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def run_mode(key, sliced, rounds, times):
+    # one measurement, in this process
+    rule_engine.SLICE_PAGES = sliced
+    extractor = UNIVERSITIES[key].extractor
+    pages = [(name, inflate(html, times)) for name, html in load_fixtures(key)]
+    rss_before = max_rss_mb()
+    rows = [extractor(name, html) for name, html in pages]   # warm up, and what we compare
+
+    start = time.process_time()
+    for _ in range(rounds):
+        for name, html in pages:
+            extractor(name, html)
+    cpu = time.process_time() - start
+    return {
+        'pages': len(pages),
+        'page_kb': round(sum(len(html) for _, html in pages) / len(pages) / 1024, 1),
+        'cpu_ms': round(cpu * 1000 / (rounds * len(pages)), 3),
+        'rss_mb': round(max_rss_mb() - rss_before, 2),
+        'rows': rows,
+    }
+
+
+def measure(key, sliced, rounds, times):
+    command = [sys.executable, os.path.abspath(__file__), key, '--mode', 'sliced' if sliced else 'full',
+               '--rounds', str(rounds), '--inflate', str(times)]
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare full-page parsing with region slicing")
+    parser.add_argument('universities', nargs='*', help="default: every university with fixtures")
+    parser.add_argument('--rounds', type=int, default=50, help="passes over the fixture pages")
+    parser.add_argument('--inflate', type=int, default=20, help="repeat the filler blocks this many times")
+    parser.add_argument('--mode', choices=['full', 'sliced'], default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.mode:
+        print(json.dumps(run_mode(args.universities[0], args.mode == 'sliced', args.rounds, args.inflate)))
+        return 0
+
+    keys = args.universities or [
+        key for key, university in sorted(UNIVERSITIES.items())
+        if university.extractor is not None and os.path.isdir(os.path.join(FIXTURES, key))
+    ]
+    mismatched = []
+    print(f"{'extractor':<10} {'page KB':>8} {'full ms':>8} {'sliced ms':>10} {'speedup':>8} {'full MB':>8} {'sliced MB':>10}")
+    for key in keys:
+        full = measure(key, False, args.rounds, args.inflate)
+        sliced = measure(key, True, args.rounds, args.inflate)
+        speedup = full['cpu_ms'] / sliced['cpu_ms'] if sliced['cpu_ms'] else float('inf')
+        print(f"{key:<10} {full['page_kb']:>8} {full['cpu_ms']:>8} {sliced['cpu_ms']:>10} {speedup:>7.1f}x "
+              f"{full['rss_mb']:>8} {sliced['rss_mb']:>10}")
+        if full['rows'] != sliced['rows']:
+            mismatched.append(key)
+
+    for key in mismatched:
+        print(f"MISMATCH: {key} extracts different rows when sliced")
+    return 1 if mismatched else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
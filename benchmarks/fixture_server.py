@@ -0,0 +1,226 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_extractors import load_fixtures
+
+
+# local stand-in for the universities' course sites, for load testing the crawl
+#
+# each university gets its own port (so the crawler sees four hosts) and its
+# real course url layout. pages are the fixture pages (or the newest archived
+# copies with --archive), multiplied to --pages per site: /courses/history-17
+# serves history.html. every site also serves /links.csv (kiscourseid,crseurl
+# like the Discover Uni link lists) and /robots.txt.
+#
+# faults, per request:
+#   --latency lognormal:80,0.6    time to first byte - fixed:MS, uniform:LO,HI or lognormal:MEDIAN_MS,SIGMA
+#   --bandwidth 500               KB/s per response body
+#   --max-rps 50                  per site; over it -> 429 with Retry-After
+#   --p429 0.01 --p503 0.02       random 429 / 503 answers
+#   --ptimeout 0.005 --hang 30    requests that hang this long before a 503
+#   --crawl-delay 1               Crawl-delay in robots.txt
+#   --churn                       a different banner on every response, like a live site's nav/news
+#
+#   python benchmarks/fixture_server.py --pages 5000 --latency lognormal:80,0.6 --p503 0.01
+# prints one json line with the sites' base urls, then serves until killed.
+# bench_crawl.py starts it for you.
+
+COURSE_PATHS = {
+    'cam': '/courses/',
+    'lse': '/study-at-lse/undergraduate/',
+    'oxford': '/admissions/undergraduate/courses/course-listing/',
+    'ucl': '/prospective-students/undergraduate/degrees/',
+}
+
+
+def latency_sampler(spec, rng):
+    # -> function returning seconds
+    kind, _, args = spec.partition(':')
+    values = [float(value) for value in args.split(',') if value]
+    if kind == 'none':
+        return lambda: 0.0
+    if kind == 'fixed':
+        return lambda: values[0] / 1000
+    if kind == 'uniform':
+        return lambda: rng.uniform(values[0], values[1]) / 1000
+    if kind == 'lognormal':
+        median, sigma = values
+        return lambda: rng.lognormvariate(math.log(median), sigma) / 1000
+    raise ValueError(f"unknown latency distribution: {spec}")
+
+
+def archived_pages(key):
+    import page_archive
+    archive = page_archive.PageArchive()
+    try:
+        pages = []
+        for entry in archive.latest_entries(source=key):
+            html = archive.latest(entry['url'])
+            if html is not None:
+                pages.append((urlsplit(entry['url']).path.rstrip('/').rsplit('/', 1)[-1], html))
+        return pages
+    finally:
+        archive.close()
+
+
+class Site:
+    def __init__(self, key, pages, options):
+        self.key = key
+        self.prefix = COURSE_PATHS[key]
+        self.pages = {os.path.splitext(name)[0]: html.encode('utf-8') for name, html in pages}
+        self.slugs = sorted(self.pages)
+        self.options = options
+        self.rng = random.Random(f"{options.seed}-{key}")
+        self.lock = threading.Lock()
+        self.latency = latency_sampler(options.latency, self.rng)
+        self.window = (0, 0)    # (second, requests in it) for --max-rps
+        self.served = 0
+
+    def links(self, base):
+        # the first --pages (slug, copy) pairs, copies round-robin over the slugs
+        rows = ['kiscourseid,crseurl']
+        for n in range(self.options.pages):
+            slug, copy = self.slugs[n % len(self.slugs)], n // len(self.slugs)
+            page = slug if copy == 0 else f"{slug}-{copy}"
+            rows.append(f"{self.key.upper()}_{n},{base}{self.prefix}{page}")
+        return ('\n'.join(rows) + '\n').encode('utf-8')
+
+    def page(self, path):
+        if not path.startswith(self.prefix):
+            return None
+        name = path[len(self.prefix):].rstrip('/')
+        if name in self.pages:
+            return self.pages[name]
+        slug, _, copy = name.rpartition('-')
+        return self.pages.get(slug) if copy.isdigit() else None
+
+    def fault(self):
+        # -> None, or (status, retry_after, hang seconds) for this request
+        options = self.options
+        with self.lock:
+            self.served += 1
+            second = int(time.monotonic())
+            count = self.window[1] + 1 if self.window[0] == second else 1
+            self.window = (second, count)
+            roll = self.rng.random()
+        if options.max_rps and count > options.max_rps:
+            return 429, 1, 0
+        if roll < options.ptimeout:
+            return 503, None, options.hang
+        roll -= options.ptimeout
+        if roll < options.p429:
+            return 429, 2, 0
+        roll -= options.p429
+        if roll < options.p503:
+            return 503, None, 0
+        return None
+
+
+def make_handler(site):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def send(self, status, body=b'', content_type='text/html; charset=utf-8', headers=None):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            bandwidth = site.options.bandwidth * 1024
+            if not bandwidth:
+                self.wfile.write(body)
+                return
+            chunk = max(1024, int(bandwidth / 20))
+            for start in range(0, len(body), chunk):
+                self.wfile.write(body[start:start + chunk])
+                time.sleep(min(chunk, len(body) - start) / bandwidth)
+
+        def do_GET(self):
+            path = urlsplit(self.path).path
+            base = f"http://{self.headers.get('Host')}"
+            if path == '/robots.txt':
+                delay = f"Crawl-delay: {site.options.crawl_delay}\n" if site.options.crawl_delay else ""
+                return self.send(200, f"User-agent: *\n{delay}".encode(), 'text/plain')
+            if path == '/links.csv':
+                return self.send(200, site.links(base), 'text/csv')
+
+            html = site.page(path)
+            if html is None:
+                return self.send(404, b'<html><h1>Not found</h1></html>')
+            body = html.find(b'<body')
+            if site.options.churn and body >= 0:
+                # right after <body ...>, outside anything the extractors read
+                at = html.find(b'>', body) + 1
+                html = html[:at] + f'<div class="banner">{time.time_ns()}</div>'.encode() + html[at:]
+            fault = site.fault()
+            time.sleep(site.latency())
+            if fault is not None:
+                status, retry_after, hang = fault
+                time.sleep(hang)
+                return self.send(status, b'<html><h1>Busy</h1></html>',
+                                 headers={'Retry-After': str(retry_after)} if retry_after else None)
+            self.send(200, html)
+
+    return Handler
+
+
+def serve(keys, options, host='127.0.0.1'):
+    # -> ({key: base url}, [servers]); each server runs in a daemon thread
+    bases, servers = {}, []
+    for key in keys:
+        pages = archived_pages(key) if options.archive else load_fixtures(key)
+        if not pages:
+            continue
+        server = ThreadingHTTPServer((host, 0), make_handler(Site(key, pages, options)))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        bases[key] = f"http://{host}:{server.server_address[1]}"
+        servers.append(server)
+    return bases, servers
+
+
+def add_fault_arguments(parser):
+    parser.add_argument('--pages', type=int, default=500, help="course pages per site")
+    parser.add_argument('--archive', action='store_true', help="serve the newest archived pages instead of the fixtures")
+    parser.add_argument('--latency', default='lognormal:60,0.5', help="none, fixed:MS, uniform:LO,HI or lognormal:MEDIAN_MS,SIGMA")
+    parser.add_argument('--bandwidth', type=float, default=0, help="KB/s per response (0: unlimited)")
+    parser.add_argument('--max-rps', type=int, default=0, help="requests per second per site before 429s (0: no cap)")
+    parser.add_argument('--p429', type=float, default=0.0, help="chance of a random 429")
+    parser.add_argument('--p503', type=float, default=0.0, help="chance of a random 503")
+    parser.add_argument('--ptimeout', type=float, default=0.0, help="chance a request hangs for --hang seconds")
+    parser.add_argument('--hang', type=float, default=30.0, help="seconds a hanging request takes")
+    parser.add_argument('--crawl-delay', type=int, default=0, help="Crawl-delay in robots.txt (whole seconds)")
+    parser.add_argument('--churn', action='store_true', help="vary a banner on every response so no two bodies match")
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve fixture course pages with injected latency and faults")
+    parser.add_argument('universities', nargs='*', help=f"default: {', '.join(sorted(COURSE_PATHS))}")
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    bases, _ = serve(args.universities or sorted(COURSE_PATHS), args)
+    print(json.dumps(bases), flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
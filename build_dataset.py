@@ -0,0 +1,215 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+import discover_uni
+from checkpoint_output import write_csv_atomic
+from normalise_grades import add_grade_columns, csv_rows
+from string_table import intern_requirements, read_table, table_path, write_table
+from scraper_registry import UNIVERSITIES, RECORD_COLUMNS, load_extractors
+
+
+# incremental golden triangle dataset builder
+#
+# merges the per-university degree facts csvs into one combined csv keyed on
+# kiscourseid. a state file remembers each input's fingerprint and every
+# normalised row with its hash, so:
+#   - if no input changed, nothing is rebuilt or written
+#   - only the universities whose csv changed are re-read, re-hashed and diffed
+#     (the others' rows come from the state file)
+#   - every build appends a compact changelog entry (added / removed / modified courses)
+# what isn't incremental: when anything changed, the grade columns are recomputed
+# and the whole dataset is rewritten, so that cost - and the state file's size -
+# grows with the dataset, not with the change. fine at a few thousand courses.
+# the written dataset also carries the precomputed grade columns from normalise_grades.py
+#
+#   python build_dataset.py                 -> golden_triangle_dataset.csv
+#   python build_dataset.py --force         -> rebuild even if nothing changed
+#   python build_dataset.py --intern        -> requirement texts as ids into requirement_strings.json (string_table.py)
+#   python build_dataset.py --discover-uni discover_uni.zip -> also join provaddress, median_salary and
+#                                             the teaching location from the bulk download (discover_uni.py)
+
+DEFAULT_OUTPUT = 'golden_triangle_dataset.csv'
+DEFAULT_STATE = os.path.join('.scrape_cache', 'dataset_state.json')
+DEFAULT_CHANGELOG = 'dataset_changelog.jsonl'
+
+DATASET_COLUMNS = ['university_name'] + RECORD_COLUMNS
+
+
+def normalise(value):
+    if value is None:
+        return ''
+    return ' '.join(str(value).split())
+
+
+def row_hash(row):
+    return hashlib.sha1('\x1f'.join(row).encode('utf-8')).hexdigest()
+
+
+def file_fingerprint(path, previous=None):
+    # stat first; only hash the contents when size/mtime moved
+    stat = os.stat(path)
+    if previous and previous['size'] == stat.st_size and previous['mtime_ns'] == stat.st_mtime_ns:
+        return previous
+    # in blocks - the Discover Uni zip is hundreds of MB
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+
+
+def read_university(university, path):
+    # -> {kiscourseid: normalised row in DATASET_COLUMNS order}
+    rows = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for record in csv.DictReader(f):
+            record['university_name'] = university.name
+            row = [normalise(record.get(column)) for column in DATASET_COLUMNS]
+            rows[row[DATASET_COLUMNS.index('kiscourseid')]] = row
+    return rows
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {'inputs': {}, 'rows': {}}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(path, state):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def diff_rows(key, old_rows, new_rows):
+    # old_rows: {kis: [hash, row]}, new_rows: {kis: row}
+    added, removed, modified = [], [], []
+    for kis, row in new_rows.items():
+        if kis not in old_rows:
+            added.append(f"{key}:{kis}")
+        elif old_rows[kis][0] != row_hash(row):
+            old_row = old_rows[kis][1]
+            fields = [column for column, old, new in zip(DATASET_COLUMNS, old_row, row) if old != new]
+            modified.append({'course': f"{key}:{kis}", 'fields': fields})
+    removed = [f"{key}:{kis}" for kis in old_rows if kis not in new_rows]
+    return added, removed, modified
+
+
+def with_course_details(keyed_rows, bulk_path):
+    # keyed_rows: [(university key, row)] -> rows with DETAIL_COLUMNS appended, joined on (ukprn, kiscourseid)
+    ukprns = {key: university.ukprn for key, university in UNIVERSITIES.items()}
+    kis = DATASET_COLUMNS.index('kiscourseid')
+    courses = {(ukprns.get(key), row[kis]) for key, row in keyed_rows if ukprns.get(key)}
+    files = discover_uni.BulkFiles(bulk_path)
+    try:
+        details = discover_uni.course_details(files, courses)
+    finally:
+        files.close()
+    blank = [None] * len(discover_uni.DETAIL_COLUMNS)
+    matched = sum(1 for values in details.values() if any(value is not None for value in values))
+    print(f"Discover Uni details for {matched} of {len(keyed_rows)} courses")
+    return [row + details.get((ukprns.get(key), row[kis]), blank) for key, row in keyed_rows]
+
+
+def build(output=DEFAULT_OUTPUT, state_path=DEFAULT_STATE, changelog=DEFAULT_CHANGELOG, input_dir=None, force=False,
+          intern=False, discover_uni_path=None):
+    state = load_state(state_path)
+    changes = {'added': [], 'removed': [], 'modified': []}
+    changed_inputs = []
+
+    for key, university in sorted(UNIVERSITIES.items()):
+        path = university.output if input_dir is None else os.path.join(input_dir, university.output)
+        if not os.path.exists(path):
+            if key in state['rows']:
+                # a university's csv disappeared - its courses are gone from the dataset
+                changes['removed'] += [f"{key}:{kis}" for kis in state['rows'].pop(key)]
+                state['inputs'].pop(key, None)
+                changed_inputs.append(key)
+            continue
+
+        previous = state['inputs'].get(key)
+        fingerprint = file_fingerprint(path, previous)
+        if not force and previous and previous['sha256'] == fingerprint['sha256'] and key in state['rows']:
+            state['inputs'][key] = fingerprint   # mtime may have moved without the contents changing
+            continue
+
+        new_rows = read_university(university, path)
+        added, removed, modified = diff_rows(key, state['rows'].get(key, {}), new_rows)
+        changes['added'] += added
+        changes['removed'] += removed
+        changes['modified'] += modified
+        state['rows'][key] = {kis: [row_hash(row), row] for kis, row in new_rows.items()}
+        state['inputs'][key] = fingerprint
+        changed_inputs.append(key)
+
+    # the bulk download counts as an input too: a new release (or adding/dropping it) rebuilds
+    previous = state['inputs'].get('discover_uni')
+    if discover_uni_path is None:
+        if state['inputs'].pop('discover_uni', None) is not None:
+            changed_inputs.append('discover_uni')
+    elif os.path.isfile(discover_uni_path):
+        fingerprint = file_fingerprint(discover_uni_path, previous)
+        if not previous or previous['sha256'] != fingerprint['sha256']:
+            changed_inputs.append('discover_uni')
+        state['inputs']['discover_uni'] = fingerprint
+    else:
+        # an unpacked directory isn't fingerprinted - always rejoin
+        changed_inputs.append('discover_uni')
+
+    if not changed_inputs and os.path.exists(output) and not force:
+        save_state(state_path, state)
+        print("Nothing changed upstream - dataset is up to date")
+        return None
+
+    keyed_rows = [(key, row) for key in sorted(state['rows']) for _, row in state['rows'][key].values()]
+    rows = [row for _, row in keyed_rows]
+    columns = DATASET_COLUMNS
+    if discover_uni_path is not None:
+        rows = with_course_details(keyed_rows, discover_uni_path)
+        columns = DATASET_COLUMNS + discover_uni.DETAIL_COLUMNS
+    dataset = add_grade_columns(pd.DataFrame(rows, columns=columns).replace('', None))
+    if intern:
+        # extend the existing table so ids the app already has stay valid
+        dataset, strings = intern_requirements(dataset, read_table(table_path(output)))
+        write_table(strings, table_path(output))
+    write_csv_atomic(output, list(dataset.columns), csv_rows(dataset))
+    save_state(state_path, state)
+
+    entry = {'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'inputs': changed_inputs, **changes}
+    if any(changes.values()):
+        with open(changelog, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+    print(f"Wrote {len(rows)} rows to {output}: {len(changes['added'])} added, "
+          f"{len(changes['removed'])} removed, {len(changes['modified'])} modified")
+    return entry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge the per-university degree facts into one dataset")
+    parser.add_argument('--out', default=DEFAULT_OUTPUT, help="combined csv to write")
+    parser.add_argument('--input-dir', default=None, help="where the per-university csvs are (default: repo root)")
+    parser.add_argument('--state', default=DEFAULT_STATE, help="row hashes from the last build")
+    parser.add_argument('--changelog', default=DEFAULT_CHANGELOG, help="append a json line per build here")
+    parser.add_argument('--force', action='store_true', help="rebuild even if no input changed")
+    parser.add_argument('--intern', action='store_true',
+                        help="write the requirement texts once, into requirement_strings.json, and ids in the csv")
+    parser.add_argument('--discover-uni', default=None, metavar='BULK',
+                        help="join provaddress, median salary and location from the Discover Uni zip (or unpacked directory)")
+    args = parser.parse_args(argv)
+
+    load_extractors()  # registers the scrapers' outputs
+    build(args.out, args.state, args.changelog, args.input_dir, args.force, args.intern, args.discover_uni)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import csv
+import os
+
+
+# streaming csv output with a checkpoint, for scrape_all.py
+#
+# while a run is going, every row is appended to <output>.partial as soon as
+# it's extracted and its kiscourseid goes into <output>.checkpoint. if the run
+# dies, --resume picks up from the checkpoint and only scrapes what's missing.
+# the real <output> is only replaced (atomically) once every row is in, so a
+# half-finished run never clobbers a good csv.
+
+
+def write_csv_atomic(path, columns, rows):
+    # rows: lists in `columns` order; written to a temp file then swapped in
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(['' if value is None else value for value in row])
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class CheckpointedCsv:
+    def __init__(self, path, columns, resume=False):
+        self.path = path
+        self.columns = columns
+        self.partial_path = path + '.partial'
+        self.checkpoint_path = path + '.checkpoint'
+
+        if not resume:
+            for stale in (self.partial_path, self.checkpoint_path):
+                if os.path.exists(stale):
+                    os.remove(stale)
+
+        self.done = set()
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding='utf-8') as f:
+                self.done = {line.strip() for line in f if line.strip()}
+
+        new_file = not os.path.exists(self.partial_path)
+        self.partial = open(self.partial_path, 'a', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.partial, lineterminator='\n')
+        if new_file:
+            self.writer.writerow(columns)
+        self.checkpoint = open(self.checkpoint_path, 'a', encoding='utf-8')
+
+    def is_done(self, kiscourseid):
+        return str(kiscourseid) in self.done
+
+    def write(self, record):
+        # the row goes down before the checkpoint, so a crash between the two
+        # only means the row is scraped (and deduplicated) again on resume
+        self.writer.writerow(['' if record[column] is None else record[column] for column in self.columns])
+        self.partial.flush()
+        self.checkpoint.write(f"{record['kiscourseid']}\n")
+        self.checkpoint.flush()
+        self.done.add(str(record['kiscourseid']))
+
+    def close(self):
+        self.partial.close()
+        self.checkpoint.close()
+
+    def finalise(self, order):
+        # order: [(kiscourseid, url), ...] as in the links csv - rows are
+        # written back in that order, one per course, then swapped into place
+        self.close()
+        with open(self.partial_path, newline='', encoding='utf-8') as f:
+            rows = {}
+            for row in csv.DictReader(f):
+                rows[(row['kiscourseid'], row['url'])] = row
+        ordered = [
+            [rows[key][column] for column in self.columns]
+            for key in ((str(kis), str(url)) for kis, url in order) if key in rows
+        ]
+        write_csv_atomic(self.path, self.columns, ordered)
+        os.remove(self.partial_path)
+        os.remove(self.checkpoint_path)
+        return len(ordered)
@@ -0,0 +1,123 @@
+import argparse
+import os
+import re
+
+import pandas as pd
+
+from normalise_grades import add_grade_columns
+from scraper_registry import UNIVERSITIES, load_extractors
+from string_table import intern_requirements, read_table, table_path, write_table
+
+
+# typed, compressed columnar copy of the degree facts for the shiny app
+#
+# the csvs store everything as text ("39 points " in ib_grade_req, salaries as
+# strings), so app.R has to re-coerce on every start. this writes a parquet
+# file with real integer columns and dictionary-encoded categoricals, which
+# arrow::read_parquet() loads in one go.
+#
+#   python columnar_output.py                                -> per-university csvs -> golden_triangle_dataset.parquet
+#   python columnar_output.py golden_triangle_dataset_v2.csv -> convert an existing combined csv
+#   python columnar_output.py --partition                    -> one directory per university instead
+#   python columnar_output.py --intern                       -> requirement texts as ids into requirement_strings.json
+
+DEFAULT_OUTPUT = 'golden_triangle_dataset.parquet'
+
+# low-cardinality text -> dictionary encoded
+CATEGORY_COLUMNS = ['university_name', 'degree_type', 'optional_degree_type', 'a_level_grade_req', 'a_level_subject_reqs_grade']
+
+# text that is really a number -> nullable integers
+INTEGER_COLUMNS = {'ib_grade_req': 'Int16', 'median_salary': 'Int32', 'grade_score': 'Int16', 'ib_points': 'Int16',
+                   'ib_subject_req_points': 'Int16', 'a_level_subject_reqs_id': 'Int32', 'ib_subject_req_id': 'Int32'}
+
+BOOLEAN_COLUMNS = ['non_a_level_route']
+
+number_pattern = re.compile(r'(\d+(?:,\d{3})*)')
+
+
+def parse_int(value):
+    # "41" / "39 points " / "£32,000" -> 41 / 39 / 32000; anything else -> NA
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return pd.NA
+    match = number_pattern.search(str(value))
+    return int(match.group(1).replace(',', '')) if match else pd.NA
+
+
+def load_university_outputs(keys=None, output_dir=None):
+    frames = []
+    for key, university in sorted(UNIVERSITIES.items()):
+        if keys and key not in keys:
+            continue
+        path = university.output if output_dir is None else os.path.join(output_dir, university.output)
+        if not os.path.exists(path):
+            continue
+        df = pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[''])
+        df.insert(2, 'university_name', university.name)
+        frames.append(df)
+    if not frames:
+        raise FileNotFoundError("no per-university degree facts csvs found")
+    return pd.concat(frames, ignore_index=True)
+
+
+def to_typed(df):
+    df = df.copy()
+    for column, dtype in INTEGER_COLUMNS.items():
+        if column in df.columns:
+            df[column] = df[column].map(parse_int).astype(dtype)
+    for column in BOOLEAN_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].map({'True': True, 'False': False, True: True, False: False}).astype('boolean')
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    for column in df.columns:
+        if df[column].dtype == object:
+            df[column] = df[column].astype('string')
+    return df
+
+
+def write_parquet(df, path=DEFAULT_OUTPUT, partition=False, compression='zstd', intern=False):
+    # df: raw text columns as read from the csvs; grade columns are added if missing
+    # pyarrow is only needed here, so the scrapers run without it
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("writing parquet needs pyarrow (pip install pyarrow)")
+
+    if 'a_level_grade_req' in df.columns and 'grade_score' not in df.columns:
+        df = add_grade_columns(df)
+    if intern:
+        df, strings = intern_requirements(df, read_table(table_path(path)))
+        write_table(strings, table_path(path))
+    table = pa.Table.from_pandas(to_typed(df), preserve_index=False)
+    if partition and 'university_name' in df.columns:
+        pq.write_to_dataset(table, path, partition_cols=['university_name'], compression=compression)
+    else:
+        pq.write_table(table, path, compression=compression)
+    print(f"Wrote {table.num_rows} rows to {path}")
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write the degree facts as a typed parquet dataset")
+    parser.add_argument('inputs', nargs='*', help="csv files to convert (default: the per-university outputs)")
+    parser.add_argument('--out', default=DEFAULT_OUTPUT, help="parquet file (or directory with --partition)")
+    parser.add_argument('--partition', action='store_true', help="partition by university_name")
+    parser.add_argument('--intern', action='store_true',
+                        help="store the requirement texts once, in requirement_strings.json next to the output")
+    args = parser.parse_args(argv)
+
+    if args.inputs:
+        df = pd.concat(
+            [pd.read_csv(path, dtype=str, keep_default_na=False, na_values=['']) for path in args.inputs],
+            ignore_index=True
+        )
+    else:
+        load_extractors()  # registers the scrapers' outputs
+        df = load_university_outputs()
+    write_parquet(df, args.out, partition=args.partition, intern=args.intern)
+
+
+if __name__ == '__main__':
+    main()
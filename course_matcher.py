@@ -0,0 +1,247 @@
+import argparse
+import functools
+import re
+
+import numpy as np
+import pandas as pd
+
+from normalise_grades import add_grade_columns, A_STAR_POINTS, GRADE_POINTS
+from postcode_geocoder import BAND_LABELS
+from string_table import with_texts
+from subject_index import build_index
+
+
+# course matching as column arrays + boolean masks
+#
+# app.R's filtered_courses works out get_match_type with sapply, re-greps the
+# subject requirements and runs get_subject_category_courses' keyword patterns
+# over every title on each submit. here everything that doesn't depend on the
+# query is done once when the dataset is loaded (interest category masks,
+# subject -> course masks, campus positions), a query is a handful of numpy
+# mask ANDs, and answers are kept in a bounded LRU cache keyed on the
+# canonicalised query - "A A* A" and "A* A A" with subjects in another order
+# are the same query.
+#
+#   python course_matcher.py golden_triangle_dataset_v2.csv --grades A* A A --subjects Mathematics --interests Engineering
+
+DEFAULT_CACHE_SIZE = 512
+
+MATCH_ORDER = ["Exact Match", "Good Match", "Overmatch", "No Match", "No Data"]
+MATCH_LABELS = np.array(MATCH_ORDER, dtype=object)
+
+# same keyword lists as get_subject_category_courses in app.R (regex alternation on the title, ignoring case)
+CATEGORY_KEYWORDS = {
+    "Natural Sciences": ["Applied Medical Sciences", "Audiology", "Biochemistry", "Biological Sciences",
+                         "Biomedical Sciences", "Bioprocessing", "Business and Health", "Cancer Biomedicine",
+                         "Chemistry", "Earth Sciences", "Environmental Geoscience", "Geography and Economics",
+                         "Geography", "Geology", "Human Neuroscience", "Human Sciences", "Infection and Immunity",
+                         "Mathematics with Mathematical Physics", "Mathematics and Physics", "Neuroscience",
+                         "Nutrition and Medical Sciences", "Population Health Sciences", "Psychology",
+                         "Science and Engineering", "Sport and Exercise Medical Sciences", "Sustainable Built",
+                         "Theoretical Physics", "Biochemical Engineering", "Biomedical Engineering"],
+    "Humanities": ["Anthropology", "Archaeology", "Experimental Linguistics", "Global Humanitarian",
+                   "History and Philosophy", "Philosophy, Politics and Economics", "Politics and International",
+                   "Urban Planning", "Urban Studies", "Ancient History", "Classical", "Classics",
+                   "Comparative Literature", "Creative Arts and Humanities", "Education, Society",
+                   "History", "Philosophy", "Politics, Sociology", "Viking", "Bulgarian", "Czech",
+                   "Finnish", "Hungarian", "Polish", "Romanian", "Russian and History", "Ukrainian", "Serbian",
+                   "Croatian"],
+    "Architecture": ["Architectural", "Architecture"],
+    "Computational & Mathematical Sciences": ["Astrophysics", "Computer Science", "Crime and Security Science",
+                                              "Data Science", "Geophysics", "Mathematics", "Statistical Science",
+                                              "Statistics", "Physics", "Electronic and Electrical Engineering",
+                                              "Mechanical Engineering", "Philosophy and Computer"],
+    "Social Sciences": ["Social Sciences", "Geography", "Economics", "Politics", "Sociology", "European Social"],
+    "Management": ["Management", "Business"],
+    "Medicine": ["Medical", "Medicine", "Biomedical", "Cancer", "Neuroscience", "Pharmacology", "Sport and Exercise"],
+    "Sustainability": ["Sustainable", "Sustainability"],
+    "Engineering": ["Engineering", "Computer Science"],
+    "Languages": ["Dutch", "French", "German", "Hebrew", "Hungarian", "Italian", "Norwegian",
+                  "Polish", "Romanian", "Russian Studies", "Scandinavian Studies",
+                  "Spanish and Latin American Studies", "Bulgarian", "Czech", "Danish",
+                  "Finnish", "Serbian", "Croatian", "Swedish", "Ukrainian", "Ancient Languages",
+                  "Linguistics", "Psychology and Language Sciences"],
+    "Arts": ["Fine Art", "Art", "History of Art", "Media", "Creative Arts", "English", "Literature"],
+    "Education": ["Education", "Early Childhood"],
+    "Technology": ["Information Management", "Art and Technology", "Electronic and Electrical"],
+    "Law": ["Law", "Laws"],
+}
+
+
+def grade_points(grade):
+    return A_STAR_POINTS if grade == 'A*' else GRADE_POINTS.get(grade)
+
+
+def student_score(grades):
+    # same as calculate_student_score: best three grades, None with fewer than three
+    points = [grade_points(grade) for grade in grades if grade]
+    points = [p for p in points if p is not None]
+    if len(points) < 3:
+        return None
+    return sum(sorted(points, reverse=True)[:3])
+
+
+def canonical_query(grades=(), subjects=(), postcode=None, distances=(), degree_types=(), interests=(),
+                    universities=()):
+    # the cache key: only what changes the answer, in a fixed order
+    distances = tuple(sorted(set(distances) - {"Any Distance"})) if "Any Distance" not in distances else ()
+    postcode = re.sub(r'\s+', '', postcode).upper() if postcode else None
+    return (
+        student_score(grades),
+        tuple(sorted(set(subjects))),
+        postcode,
+        distances if postcode else (),
+        tuple(sorted(set(degree_types))),
+        tuple(sorted(set(interests))),
+        tuple(sorted(set(universities))),
+    )
+
+
+class CourseMatcher:
+    def __init__(self, df, campuses=None, cache_size=DEFAULT_CACHE_SIZE):
+        # df: the normalised dataset; campuses: an optional postcode_geocoder.CampusDistances
+        if 'grade_score' not in df.columns:
+            df = add_grade_columns(df)
+        df = df.copy()
+        df['grade_score'] = pd.to_numeric(df['grade_score'], errors='coerce')
+        # the app shows courses highest grade requirement first
+        self.df = df.sort_values('grade_score', ascending=False, na_position='last', kind='stable').reset_index(drop=True)
+
+        title_column = 'title' if 'title' in self.df.columns else 'degree_title'
+        titles = self.df[title_column].fillna('').astype(str)
+        self.grade_score = self.df['grade_score'].to_numpy(dtype=float)
+        self.degree_type = self.df['degree_type'].fillna('').to_numpy(dtype=str)
+        self.university = self.df['university_name'].fillna('').to_numpy(dtype=str) \
+            if 'university_name' in self.df.columns else np.full(len(self.df), '')
+
+        self.interest_masks = {
+            category: titles.str.contains('|'.join(keywords), case=False, regex=True).to_numpy()
+            for category, keywords in CATEGORY_KEYWORDS.items()
+        }
+
+        self.subject_masks = {}
+        for subject, entry in build_index(self.df)['subjects'].items():
+            mask = np.zeros(len(self.df), dtype=bool)
+            mask[entry['required'] + entry['mentioned']] = True
+            self.subject_masks[subject] = mask
+
+        # row -> position in the campus table (-1 without one)
+        self.campuses = campuses
+        self.campus_rows = None
+        if campuses is not None and 'provaddress' in self.df.columns:
+            positions = {address: i for i, address in enumerate(campuses.provaddress)}
+            self.campus_rows = self.df['provaddress'].map(positions).fillna(-1).astype(int).to_numpy()
+
+        self._answer = functools.lru_cache(maxsize=cache_size)(self._run)
+
+    def cache_info(self):
+        return self._answer.cache_info()
+
+    def match_priority(self, score):
+        # index into MATCH_ORDER per row, same rules as get_match_type
+        course = self.grade_score
+        if score is None:
+            return np.full(len(course), MATCH_ORDER.index("No Data"))
+        difference = score - course
+        return np.select(
+            [np.isnan(course), difference == 0, (difference > 0) & (difference <= 30), difference > 30],
+            [4, 0, 1, 2],
+            default=3
+        )
+
+    def distances(self, postcode):
+        # -> (miles, band) per row, NaN / "Unknown" where there's no campus or postcode
+        miles = np.full(len(self.df), np.nan)
+        bands = np.full(len(self.df), None, dtype=object)
+        if not postcode or self.campus_rows is None:
+            return miles, bands
+        located = self.campuses.from_postcode(postcode)
+        if located is None:
+            return miles, np.full(len(self.df), "Error", dtype=object)
+        has_campus = self.campus_rows >= 0
+        miles[has_campus] = located['distance_miles'].to_numpy()[self.campus_rows[has_campus]]
+        bands[:] = BAND_LABELS[-1]
+        bands[has_campus] = located['distance_range'].to_numpy()[self.campus_rows[has_campus]]
+        return miles, bands
+
+    def _run(self, key):
+        score, subjects, postcode, distances, degree_types, interests, universities = key
+        keep = np.ones(len(self.df), dtype=bool)
+
+        miles, bands = self.distances(postcode)
+        if distances:
+            keep &= np.isin(bands, distances)
+        if interests:
+            keep &= np.logical_or.reduce([self.interest_masks[category] for category in interests
+                                          if category in self.interest_masks] or [np.zeros(len(keep), bool)])
+        if degree_types:
+            keep &= np.isin(self.degree_type, degree_types)
+        if universities:
+            keep &= np.isin(self.university, universities)
+
+        subject_met = np.zeros(len(self.df), dtype=bool)
+        for subject in subjects:
+            if subject in self.subject_masks:
+                subject_met |= self.subject_masks[subject]
+
+        priority = self.match_priority(score)
+        match_type = MATCH_LABELS[priority]
+        rows = np.flatnonzero(keep)
+        if score is not None:
+            # match type first, then highest grade_score (rows are already in that order)
+            rows = rows[np.argsort(priority[rows], kind='stable')]
+
+        for array in (rows, match_type, subject_met, miles, bands):
+            array.setflags(write=False)   # shared between callers through the cache
+        return rows, match_type, subject_met, miles, bands
+
+    def query(self, grades=(), subjects=(), postcode=None, distances=(), degree_types=(), interests=(),
+              universities=()):
+        # -> ranked dataframe with match_type, subject_requirements_met, distance_miles, distance_range
+        key = canonical_query(grades, subjects, postcode, distances, degree_types, interests, universities)
+        rows, match_type, subject_met, miles, bands = self._answer(key)
+        result = self.df.iloc[rows].copy()
+        result['match_type'] = match_type[rows]
+        result['subject_requirements_met'] = subject_met[rows]
+        result['distance_miles'] = miles[rows]
+        result['distance_range'] = bands[rows]
+        result['student_score'] = key[0]
+        return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Match courses to a student's grades, subjects and interests")
+    parser.add_argument('input', help="dataset csv")
+    parser.add_argument('--grades', nargs='*', default=[])
+    parser.add_argument('--subjects', nargs='*', default=[])
+    parser.add_argument('--postcode', default=None)
+    parser.add_argument('--distances', nargs='*', default=[], help="distance bands, e.g. '0‑10 miles'")
+    parser.add_argument('--degree-types', nargs='*', default=[])
+    parser.add_argument('--interests', nargs='*', default=[], help="interest categories, e.g. Engineering")
+    parser.add_argument('--universities', nargs='*', default=[])
+    parser.add_argument('--campuses', default=None, help="campus_locations.csv (needs the postcode table)")
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    unknown = set(args.interests) - set(CATEGORY_KEYWORDS)
+    if unknown:
+        parser.error(f"unknown interest categories: {', '.join(sorted(unknown))}")
+
+    campuses = None
+    if args.campuses:
+        from postcode_geocoder import CampusDistances
+        campuses = CampusDistances(args.campuses)
+
+    df = with_texts(pd.read_csv(args.input, dtype=str, keep_default_na=False, na_values=['']), args.input)
+    matcher = CourseMatcher(df, campuses)
+    result = matcher.query(args.grades, args.subjects, args.postcode, args.distances, args.degree_types,
+                           args.interests, args.universities)
+    title_column = 'title' if 'title' in result.columns else 'degree_title'
+    columns = [c for c in ['university_name', title_column, 'a_level_grade_req', 'match_type',
+                           'subject_requirements_met', 'distance_range'] if c in result.columns]
+    print(f"{len(result)} matching courses")
+    print(result[columns].head(args.top).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
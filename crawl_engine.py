@@ -0,0 +1,548 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import random
+import sys
+import time
+from collections import defaultdict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import telemetry
+
+
+# shared fetch engine for all the *_degree_facts scrapers
+#
+# every host gets its own keep-alive session, its own concurrency cap and its
+# own politeness budget (minimum gap between request starts), and all hosts
+# are crawled at the same time - so a full refresh takes as long as the
+# slowest university, not the sum of all of them
+#
+# the per-host limits adapt as the crawl goes (AIMD): a 429/5xx, a timeout or
+# latency climbing well above the host's best halves the requests in flight,
+# and once that's down to one, doubles the gap between starts instead. every
+# window of healthy responses undoes it again - the gap first, then one more
+# request in flight (up to max_per_host). Retry-After pauses the whole host,
+# robots.txt Crawl-delay / Request-rate is a floor on the gap, and failed GETs
+# are retried with jittered exponential backoff.
+#
+# with workers=N, scrape_many parses in a process pool instead of on the event
+# loop: fetchers hand pages to the pool as they land and carry straight on,
+# and at most max_pending pages are fetched-but-not-yet-parsed at once - when
+# the parsers fall behind, fetching waits, so memory stays flat however long
+# the link list is.
+#
+# with a cache and the universities' rule sets, rows are also memoised by the
+# fingerprint of the requirement regions (see response_cache.py): a page that
+# changed everywhere except where the extractor looks is answered from the
+# memo in the main process and never reaches a parser. only rows that came
+# from the regions alone are memoised - one that needed the rest of the page
+# (rule_engine.py falls back to it) isn't a function of the fingerprint.
+
+DEFAULT_PER_HOST = 4      # requests in flight per host to start with
+DEFAULT_MAX_PER_HOST = 12 # ... and the most it will grow to
+DEFAULT_DELAY = 0.25      # seconds between request starts per host
+DEFAULT_TIMEOUT = 15
+DEFAULT_RETRIES = 3
+DEFAULT_MAX_PENDING = 64  # pages fetched but not yet parsed, with a parse pool
+
+MAX_DELAY = 30.0          # longest gap a host can be backed off to
+MAX_RETRY_AFTER = 300.0   # don't let one header park a host for longer than this
+BACKOFF_BASE = 1.0        # retry n waits up to BACKOFF_BASE * 2**n seconds (full jitter)
+BACKOFF_CAP = 60.0
+SLOW_FACTOR = 2.0         # latency this many times the host's best counts as overload...
+SLOW_MARGIN = 0.25        # ...if it is also this many seconds worse
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+# not_modified is set when the server answered 304 and text came from the cache
+# stats holds the fetch timings when the engine is timed (see telemetry.py)
+Page = namedtuple('Page', ['url', 'status', 'text', 'error', 'not_modified', 'stats'], defaults=[False, None])
+
+
+class HostLimiter:
+    def __init__(self, per_host, delay, max_per_host=None):
+        self.limit = per_host
+        self.max_limit = max(per_host, max_per_host or per_host)
+        self.min_delay = delay
+        self.delay = delay
+        self.next_slot = 0.0
+        self.in_flight = 0
+        self.condition = asyncio.Condition()
+        self.latency = None     # moving average of response time
+        self.best = None        # lowest moving average seen (drifts up slowly)
+        self.healthy = 0
+        self.calm_until = 0.0
+        self.backoffs = 0
+        self.retries = 0
+
+    def crawl_delay(self, delay):
+        # robots.txt asked for at least this gap
+        self.min_delay = max(self.min_delay, delay)
+        self.delay = max(self.delay, delay)
+
+    async def acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self, elapsed=None, overloaded=False, retry_after=None):
+        # feed back how the request went, then free its place
+        async with self.condition:
+            self.in_flight -= 1
+            if overloaded:
+                self.back_off(retry_after)
+            elif elapsed is not None:
+                self.observe(elapsed)
+            self.condition.notify_all()
+
+    async def wait_turn(self):
+        # reserve the next start slot, then sleep until it comes round
+        now = time.monotonic()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.delay
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def observe(self, elapsed):
+        self.latency = elapsed if self.latency is None else 0.8 * self.latency + 0.2 * elapsed
+        self.best = self.latency if self.best is None else min(self.latency, self.best * 1.01)
+        if self.latency > SLOW_FACTOR * self.best and self.latency > self.best + SLOW_MARGIN:
+            self.back_off()
+            return
+        self.healthy += 1
+        if self.healthy >= self.limit:
+            # a full window went through cleanly: close the gap, then one more in flight
+            self.healthy = 0
+            if self.delay > self.min_delay:
+                half = self.delay / 2
+                self.delay = max(self.min_delay, half if half >= 0.01 else 0)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1)
+
+    def back_off(self, retry_after=None):
+        now = time.monotonic()
+        if retry_after is not None:
+            self.next_slot = max(self.next_slot, now + min(retry_after, MAX_RETRY_AFTER))
+        self.healthy = 0
+        if now < self.calm_until:
+            return   # the requests already in flight when we backed off don't count twice
+        if self.limit > 1:
+            self.limit //= 2
+        else:
+            self.delay = min(MAX_DELAY, max(self.delay * 2, self.min_delay, DEFAULT_DELAY))
+        self.calm_until = now + max(self.delay * self.limit, self.latency or 0)
+        self.backoffs += 1
+
+
+def parse_retry_after(value):
+    # seconds, or an http date; None if missing or unreadable
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def robots_delay(text, user_agent):
+    # Crawl-delay, or Request-rate as seconds per request - whichever is slower
+    parser = RobotFileParser()
+    parser.parse(text.splitlines())
+    delays = []
+    crawl_delay = parser.crawl_delay(user_agent)
+    if crawl_delay:
+        delays.append(float(crawl_delay))
+    rate = parser.request_rate(user_agent)
+    if rate and rate.requests:
+        delays.append(rate.seconds / rate.requests)
+    return max(delays) if delays else None
+
+
+class CrawlEngine:
+    def __init__(self, per_host=DEFAULT_PER_HOST, delay=DEFAULT_DELAY, timeout=DEFAULT_TIMEOUT, host_overrides=None, cache=None,
+                 timed=False, max_per_host=DEFAULT_MAX_PER_HOST, retries=DEFAULT_RETRIES, robots=True):
+        # host_overrides: {'www.ox.ac.uk': {'per_host': 2, 'max_per_host': 2, 'delay': 1.0}}
+        # cache: a response_cache.ResponseCache, used to revalidate instead of refetch
+        # timed: record dns / connect / ttfb / total times and bytes on every Page
+        # max_per_host: how far concurrency may grow (= per_host for a fixed rate)
+        # retries: extra attempts for a GET that timed out or got a 429/5xx
+        # robots: honour robots.txt Crawl-delay / Request-rate
+        self.per_host = per_host
+        self.max_per_host = max_per_host
+        self.timed = timed
+        self.delay = delay
+        self.timeout = timeout
+        self.retries = retries
+        self.robots = robots
+        self.host_overrides = host_overrides or {}
+        self.cache = cache
+        self.sessions = {}
+        self.limiters = {}
+        self.robots_checked = {}
+        self.executor = None
+
+    def _host_settings(self, host):
+        # -> (per_host to start with, max per_host, delay)
+        settings = self.host_overrides.get(host, {})
+        per_host = settings.get('per_host', self.per_host)
+        max_per_host = settings.get('max_per_host', max(per_host, self.max_per_host or per_host))
+        return per_host, max_per_host, settings.get('delay', self.delay)
+
+    def _session(self, host):
+        if host not in self.sessions:
+            _, max_per_host, _ = self._host_settings(host)
+            session = requests.Session()
+            adapter_class = telemetry.timed_adapter if self.timed else HTTPAdapter
+            adapter = adapter_class(pool_connections=1, pool_maxsize=max_per_host)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self.sessions[host] = session
+        return self.sessions[host]
+
+    def _limiter(self, host):
+        if host not in self.limiters:
+            per_host, max_per_host, delay = self._host_settings(host)
+            self.limiters[host] = HostLimiter(per_host, delay, max_per_host)
+        return self.limiters[host]
+
+    async def _check_robots(self, url, session, limiter):
+        # once per host; the first fetch reads robots.txt, the rest wait for it
+        parts = urlsplit(url)
+        if parts.netloc not in self.robots_checked:
+            self.robots_checked[parts.netloc] = asyncio.get_running_loop().run_in_executor(
+                self.executor, self._robots_delay, session, f"{parts.scheme}://{parts.netloc}/robots.txt")
+        delay = await self.robots_checked[parts.netloc]
+        if delay:
+            limiter.crawl_delay(delay)
+
+    def _robots_delay(self, session, robots_url):
+        try:
+            response = session.get(robots_url, timeout=self.timeout)
+        except requests.RequestException:
+            return None
+        if response.status_code != 200:
+            return None
+        return robots_delay(response.text, session.headers.get('User-Agent', '*'))
+
+    def _get(self, session, url, headers, stats=None):
+        if stats is not None:
+            response = telemetry.timed_get(session, url, stats, headers=headers, timeout=self.timeout)
+        else:
+            response = session.get(url, headers=headers, timeout=self.timeout)
+        return response.status_code, response.text, response.headers
+
+    def _revalidated(self, url, status, text, headers, stats=None):
+        # runs on the event loop thread, so the cache's sqlite connection stays single-threaded
+        if status == 304:
+            cached = self.cache.get(url)
+            if cached is not None:
+                self.cache.touch(url)
+                return Page(url, status, cached[0], None, True, stats)
+        if status == 200:
+            self.cache.put(url, text, headers.get('ETag'), headers.get('Last-Modified'))
+        return Page(url, status, text, None, False, stats)
+
+    async def _attempt(self, url, session, limiter, headers, stats, pending=None):
+        # one GET inside the host's limits -> (status, text, headers, error, retry_after)
+        # pending is taken while holding the host's place, so a host can't hoard
+        # the budget with requests it isn't allowed to start yet
+        await limiter.acquire()
+        elapsed, overloaded, retry_after = None, False, None
+        try:
+            if pending is not None:
+                await pending.acquire()
+            await limiter.wait_turn()
+            started = time.monotonic()
+            try:
+                status, text, response_headers = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self._get, session, url, headers, stats)
+            except Exception as e:
+                overloaded = isinstance(e, TRANSIENT_ERRORS)
+                return None, None, None, e, None
+            elapsed = time.monotonic() - started
+            if status in RETRY_STATUSES:
+                overloaded = True
+                retry_after = parse_retry_after(response_headers.get('Retry-After'))
+            return status, text, response_headers, None, retry_after
+        finally:
+            await limiter.release(elapsed, overloaded, retry_after)
+
+    async def fetch(self, url, pending=None):
+        # pending: a semaphore held from the request going out until the caller
+        # releases it (only the attempt whose answer is kept holds on to it)
+        host = urlsplit(url).netloc
+        session = self._session(host)
+        limiter = self._limiter(host)
+        if self.robots:
+            await self._check_robots(url, session, limiter)
+        headers = self.cache.conditional_headers(url) if self.cache is not None else {}
+        for attempt in range(self.retries + 1):
+            stats = {} if self.timed else None
+            status, text, response_headers, error, retry_after = await self._attempt(
+                url, session, limiter, headers, stats, pending)
+            transient = isinstance(error, TRANSIENT_ERRORS) or status in RETRY_STATUSES
+            if not transient or attempt == self.retries:
+                break
+            if pending is not None:
+                pending.release()
+            limiter.retries += 1
+            if retry_after is None:
+                # with Retry-After the limiter has already paused the whole host
+                await asyncio.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)))
+        if stats is not None:
+            stats['attempts'] = attempt + 1
+        if error is not None:
+            return Page(url, None, None, error, False, stats)
+        if self.cache is not None:
+            return self._revalidated(url, status, text, response_headers, stats)
+        return Page(url, status, text, None, False, stats)
+
+    def report(self):
+        # one line per host: where the adaptive limits ended up
+        lines = []
+        for host, limiter in sorted(self.limiters.items()):
+            latency = f", {limiter.latency * 1000:.0f} ms avg" if limiter.latency is not None else ""
+            lines.append(f"{host}: {limiter.limit} in flight, {limiter.delay:.2f}s apart{latency}, "
+                         f"{limiter.backoffs} backoffs, {limiter.retries} retries")
+        return lines
+
+    async def crawl(self, urls, on_page=None, max_pending=None, keep_pages=True):
+        # results come back in the same order as urls (None for every page if not keep_pages);
+        # on_page(i, page) is also called as each page lands, in completion order -
+        # it can be a coroutine, and with max_pending at most that many pages are
+        # between fetch and the end of their on_page at once
+        by_host = defaultdict(deque)
+        for i, url in enumerate(urls):
+            by_host[urlsplit(url).netloc].append((i, url))
+        self.limiters = {}
+        self.robots_checked = {}
+        workers = sum(self._host_settings(host)[1] for host in by_host) or 1
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        results = [None] * len(urls)
+
+        pending = asyncio.Semaphore(max_pending) if max_pending else None
+
+        async def fetch_one(i, url):
+            page = await self.fetch(url, pending)
+            try:
+                if on_page is not None:
+                    handled = on_page(i, page)
+                    if inspect.isawaitable(handled):
+                        await handled
+            finally:
+                if pending is not None:
+                    pending.release()
+            if keep_pages:
+                results[i] = page
+
+        async def host_worker(queue):
+            while queue:
+                await fetch_one(*queue.popleft())
+
+        # as many workers per host as it may ever have in flight, rather than a
+        # task per url - a 30k page crawl shouldn't hold 30k coroutines
+        try:
+            await asyncio.gather(*(host_worker(queue) for host, queue in by_host.items()
+                                   for _ in range(self._host_settings(host)[1])))
+            return results
+        finally:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def close(self):
+        for session in self.sessions.values():
+            session.close()
+        self.sessions = {}
+
+
+def crawl(urls, on_page=None, verbose=False, max_pending=None, keep_pages=True, **engine_options):
+    engine = CrawlEngine(**engine_options)
+    try:
+        return asyncio.run(engine.crawl(list(urls), on_page, max_pending, keep_pages))
+    finally:
+        if verbose:
+            for line in engine.report():
+                print(line)
+        engine.close()
+
+
+def fetch_html(url, **engine_options):
+    # one page through the engine (robots, retries) for the extractors' standalone use
+    page = crawl([url], **engine_options)[0]
+    if page.error is not None:
+        raise page.error
+    return page.text
+
+
+def scrape_many(jobs, cache=None, page_hook=None, on_row=None, telemetry_log=None, workers=None,
+                max_pending=DEFAULT_MAX_PENDING, rules=None, on_failure=None, **engine_options):
+    # jobs: {name: (urls, extractor, n_fields)}
+    # rules: {name: RuleSet} for the requirements memo (needs a cache)
+    # every university's urls go through one crawl so the hosts run in parallel
+    # page_hook(name, i, page) is called for every freshly downloaded 200 - never for error bodies (404, a
+    # 5xx still failing after the retries), which would otherwise become the archive's newest copy
+    # on_row(name, i, row) is called as soon as each row is extracted
+    # on_failure(name, i, page) instead, for pages that never arrived (see failed()) - their row is all None
+    # telemetry_log: a telemetry.Telemetry that gets one event per page
+    # workers: parse in this many processes (None: on the event loop, as pages land)
+    slots = [(name, i) for name, (urls, _, _) in jobs.items() for i in range(len(urls))]
+    all_urls = [url for urls, _, _ in jobs.values() for url in urls]
+    results = {name: [None] * len(urls) for name, (urls, _, _) in jobs.items()}
+    rules = rules or {}
+
+    def finish(n, page, row, trace):
+        name, i = slots[n]
+        if telemetry_log is not None:
+            telemetry_log.page(name, page, row, trace)
+        if page_hook is not None and not failed(page) and page.status == 200:
+            page_hook(name, i, page)
+        results[name][i] = row
+        if failed(page):
+            if on_failure is not None:
+                on_failure(name, i, page)
+        elif on_row is not None:
+            on_row(name, i, row)
+
+    def handle(n, page):
+        name = slots[n][0]
+        _, extractor, n_fields = jobs[name]
+        if telemetry_log is not None:
+            with telemetry.tracing() as trace:
+                row = extract_page(page, extractor, n_fields, cache, rules.get(name))
+        else:
+            row, trace = extract_page(page, extractor, n_fields, cache, rules.get(name)), None
+        finish(n, page, row, trace)
+
+    options = dict(cache=cache, timed=telemetry_log is not None, keep_pages=False, **engine_options)
+    if not workers or workers < 2:
+        crawl(all_urls, on_page=handle, **options)
+        return results
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+
+    async def handle_in_pool(n, page):
+        name = slots[n][0]
+        _, extractor, n_fields = jobs[name]
+        key = memo_key(page, extractor, rules.get(name), cache)
+        row = ready_row(page, extractor, n_fields, cache, key)
+        trace = {'steps': {}, 'matched': []} if telemetry_log is not None else None
+        hit = row is not None
+        if row is None:
+            row, trace = await asyncio.get_running_loop().run_in_executor(
+                pool, parse_page, extractor, page.url, page.text, telemetry_log is not None or key is not None)
+            remember_row(page, extractor, row, cache, key if from_regions(trace) else None)
+        if trace is not None and key is not None:
+            trace['memo'] = 'hit' if hit else 'miss'
+        finish(n, page, row, trace)
+
+    try:
+        crawl(all_urls, on_page=handle_in_pool, max_pending=max_pending, **options)
+    finally:
+        pool.shutdown(cancel_futures=True)
+    return results
+
+
+def failed(page):
+    # no answer, or still overloaded after every retry: says nothing about the course, so worth retrying later
+    return page.error is not None or page.status in RETRY_STATUSES
+
+
+@functools.lru_cache(maxsize=None)
+def extractor_version(extractor):
+    # digest of the extractor's module and the rule engine: editing either retires its memoised rows
+    digest = hashlib.sha1()
+    for module in (extractor.__module__, 'rule_engine'):
+        path = getattr(sys.modules.get(module), '__file__', None)
+        if path is None:
+            return None
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def extractor_id(extractor):
+    # what cached rows are filed under: rows from an older version of the rules are never reused
+    return f"{extractor.__name__}@{extractor_version(extractor)}"
+
+
+def memo_key(page, extractor, rules=None, cache=None):
+    # -> (extractor@version, requirements fingerprint) this page's row is memoised under, None if it can't be
+    if cache is None or rules is None or page.error is not None or page.not_modified or page.status != 200:
+        return None
+    fingerprint = rules.fingerprint(page.text) if extractor_version(extractor) else None
+    return (extractor_id(extractor), fingerprint) if fingerprint else None
+
+
+def from_regions(trace):
+    # the row came from the requirement regions alone (no full parse, no check against the rest of
+    # the page), so every page with the same regions - the same fingerprint - gives it too
+    return trace is not None and trace.get('sliced', False) and not trace.get('probed', False)
+
+
+def ready_row(page, extractor, n_fields, cache=None, key=None):
+    # the row for a page that needs no parsing (failed fetch, unchanged page or requirements), else None
+    if page.error is not None:
+        print(f"Error scraping {page.url}: {page.error}")
+        return (None,) * n_fields
+
+    # unchanged page (304) -> reuse the row we extracted last time, unless the extractor has changed
+    # since (then the cached body is extracted again)
+    if page.not_modified:
+        row = cache.get_row(page.url, extractor_id(extractor))
+        return tuple(row) if row is not None else None
+
+    # changed page, same requirements -> reuse the row extracted from them
+    if key is not None:
+        row = cache.get_section_row(*key)
+        if row is not None:
+            remember_row(page, extractor, row, cache)
+            return tuple(row)
+    return None
+
+
+def remember_row(page, extractor, row, cache=None, key=None):
+    if cache is not None and page.status in (200, 304):
+        cache.put_row(page.url, extractor_id(extractor), row)
+    if key is not None:
+        cache.put_section_row(*key, row)
+
+
+def extract_page(page, extractor, n_fields, cache=None, rules=None):
+    key = memo_key(page, extractor, rules, cache)
+    row = ready_row(page, extractor, n_fields, cache, key)
+    trace = telemetry.current()
+    if trace is not None and key is not None:
+        trace['memo'] = 'hit' if row is not None else 'miss'
+    if row is not None:
+        return row
+    if key is not None and trace is None:
+        with telemetry.tracing() as trace:   # only to learn whether the row can be memoised
+            row = tuple(extractor(page.url, page.text))
+    else:
+        row = tuple(extractor(page.url, page.text))
+    remember_row(page, extractor, row, cache, key if from_regions(trace) else None)
+    return row
+
+
+def parse_page(extractor, url, text, traced=False):
+    # runs in a pool process: the row as a plain tuple, plus the parse trace if traced
+    if not traced:
+        return tuple(extractor(url, text)), None
+    with telemetry.tracing() as trace:
+        row = tuple(extractor(url, text))
+    return row, trace
+
+
+def scrape(urls, extractor, n_fields, cache=None, **engine_options):
+    return scrape_many({'_': (list(urls), extractor, n_fields)}, cache=cache, **engine_options)['_']
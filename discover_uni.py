@@ -0,0 +1,243 @@
+import argparse
+import csv
+import io
+import os
+import zipfile
+
+from checkpoint_output import write_csv_atomic
+from scraper_registry import UNIVERSITIES, load_extractors
+
+
+# streaming ingestion of the Discover Uni (KIS) bulk download
+#
+# the links csvs the scrapers start from, and the provaddress / median_salary
+# columns app.R shows, all come from the Discover Uni dataset. this reads the
+# official bulk download straight from its zip (or the directory it was
+# unpacked into) one row at a time, keeping only what the selected providers
+# need - so memory grows with how many courses are selected, never with the
+# size of the files.
+#   seeds    KISCOURSE.csv -> <links csv> (kiscourseid,crseurl) for every selected provider,
+#            the same files scrape_all.py pulls from GitHub (scrape_all.py --seeds DIR uses them)
+#   details  INSTITUTION / COURSELOCATION / LOCATION / salary files -> one row per course
+#            with the columns build_dataset.py --discover-uni joins on by kiscourseid
+# providers are picked by UKPRN: the registered universities' by default,
+# --ukprn for more, --all-providers for every provider in the download.
+#
+#   python discover_uni.py seeds discover_uni.zip --out seeds/
+#   python discover_uni.py seeds discover_uni.zip --all-providers --out seeds/
+#   python discover_uni.py details discover_uni.zip --ukprn 10007788 --out cam_courses.csv
+#   python build_dataset.py --discover-uni discover_uni.zip
+
+DEFAULT_SEED_DIR = 'seeds'
+DEFAULT_DETAILS = 'discover_uni_courses.csv'
+
+# columns were renamed between releases; the first candidate present wins
+NAME_COLUMNS = ['FIRST_TRADING_NAME', 'LEGAL_NAME', 'PROVNAME']
+ADDRESS_COLUMNS = ['PROVADDRESS']
+
+# (file, median salary column candidates): graduate outcomes first, LEO three years on for what's left
+SALARY_SOURCES = [('GOSALARY', ['GOINSTMED', 'GOINSTMED_UK', 'GOSALMED']), ('LEO3', ['LEO3INSTMED', 'LEO3MED'])]
+
+# what gets joined onto the scraped rows
+DETAIL_COLUMNS = ['provaddress', 'median_salary', 'location_name', 'latitude', 'longitude']
+
+# a course is listed once per mode - full-time (1), part-time (2), both (3) - and the full-time record wins
+MODE_PRIORITY = {'1': 0, '3': 1, '2': 2}
+
+
+def pick_column(header, candidates, table):
+    for candidate in candidates:
+        if candidate in header:
+            return candidate
+    raise ValueError(f"none of {candidates} in {table}.csv")
+
+
+class BulkFiles:
+    def __init__(self, path):
+        self.path = path
+        self.zip = zipfile.ZipFile(path) if os.path.isfile(path) else None
+        if self.zip is not None:
+            names = self.zip.namelist()
+        else:
+            names = [os.path.join(root, name) for root, _, files in os.walk(path) for name in files]
+        # KISCOURSE -> 'data/KISCOURSE.csv'; the zip's folder layout differs between releases
+        self.members = {os.path.splitext(os.path.basename(name))[0].upper(): name
+                        for name in names if name.lower().endswith('.csv')}
+
+    def has(self, table):
+        return table in self.members
+
+    def open(self, table):
+        if table not in self.members:
+            raise FileNotFoundError(f"no {table}.csv in {self.path}")
+        raw = self.zip.open(self.members[table]) if self.zip is not None else open(self.members[table], 'rb')
+        return io.TextIOWrapper(raw, encoding='utf-8-sig', errors='replace', newline='')
+
+    def header(self, table):
+        with self.open(table) as f:
+            return [column.strip().upper() for column in next(csv.reader(f), [])]
+
+    def rows(self, table, columns):
+        # -> tuples of just `columns`, one row at a time
+        with self.open(table) as f:
+            reader = csv.reader(f)
+            header = [column.strip().upper() for column in next(reader, [])]
+            missing = [column for column in columns if column not in header]
+            if missing:
+                raise ValueError(f"{table}.csv has no {', '.join(missing)} column")
+            positions = [header.index(column) for column in columns]
+            width = max(positions) + 1
+            for row in reader:
+                if len(row) >= width:
+                    yield tuple(row[position].strip() for position in positions)
+
+    def close(self):
+        if self.zip is not None:
+            self.zip.close()
+
+
+def selected_ukprns(ukprns=None, all_providers=False):
+    # -> set of UKPRNs, or None for every provider
+    if all_providers:
+        return None
+    selected = {university.ukprn for university in UNIVERSITIES.values() if university.ukprn}
+    return selected | set(ukprns or [])
+
+
+def best_by_mode(rows, wanted):
+    # rows: (ukprn, kiscourseid, kismode, value) -> {(ukprn, kiscourseid): value} keeping the preferred mode
+    best = {}
+    for ukprn, kis_course_id, mode, value in rows:
+        if not value or not wanted(ukprn, kis_course_id):
+            continue
+        key = (ukprn, kis_course_id)
+        rank = MODE_PRIORITY.get(mode, len(MODE_PRIORITY))
+        if key not in best or rank < best[key][0]:
+            best[key] = (rank, value)
+    return {key: value for key, (_, value) in best.items()}
+
+
+def course_urls(files, ukprns=None):
+    # -> {ukprn: {kiscourseid: crseurl}}; courses without a url have nothing to crawl
+    rows = files.rows('KISCOURSE', ['UKPRN', 'KISCOURSEID', 'KISMODE', 'CRSEURL'])
+    urls = {}
+    for (ukprn, kis_course_id), url in best_by_mode(rows, lambda ukprn, _: ukprns is None or ukprn in ukprns).items():
+        urls.setdefault(ukprn, {})[kis_course_id] = url
+    return urls
+
+
+def providers(files, ukprns=None):
+    # -> {ukprn: (name, provaddress)}
+    header = files.header('INSTITUTION')
+    columns = ['UKPRN', pick_column(header, NAME_COLUMNS, 'INSTITUTION'), pick_column(header, ADDRESS_COLUMNS, 'INSTITUTION')]
+    return {ukprn: (name, address) for ukprn, name, address in files.rows('INSTITUTION', columns)
+            if ukprns is None or ukprn in ukprns}
+
+
+def median_salaries(files, wanted):
+    salaries = {}
+    for table, candidates in SALARY_SOURCES:
+        if not files.has(table):
+            continue
+        header = files.header(table)
+        if not any(candidate in header for candidate in candidates):
+            continue
+        column = pick_column(header, candidates, table)
+        rows = files.rows(table, ['UKPRN', 'KISCOURSEID', 'KISMODE', column])
+        for key, salary in best_by_mode(rows, lambda ukprn, kis: wanted(ukprn, kis) and (ukprn, kis) not in salaries).items():
+            salaries[key] = salary
+    return salaries
+
+
+def course_locations(files, wanted):
+    # -> {(ukprn, kiscourseid): (location name, latitude, longitude)}, via the course's main teaching location
+    if not files.has('COURSELOCATION') or not files.has('LOCATION'):
+        return {}
+    location_ids = best_by_mode(files.rows('COURSELOCATION', ['UKPRN', 'KISCOURSEID', 'KISMODE', 'LOCID']), wanted)
+    needed = set((ukprn, location_id) for (ukprn, _), location_id in location_ids.items())
+    places = {}
+    for ukprn, location_id, name, latitude, longitude in files.rows(
+            'LOCATION', ['UKPRN', 'LOCID', 'LOCNAME', 'LATITUDE', 'LONGITUDE']):
+        if (ukprn, location_id) in needed:
+            places[(ukprn, location_id)] = (name, latitude, longitude)
+    return {key: places[(key[0], location_id)] for key, location_id in location_ids.items()
+            if (key[0], location_id) in places}
+
+
+def course_details(files, courses=None, ukprns=None):
+    # courses: set of (ukprn, kiscourseid) to look up, or None for every course of `ukprns`
+    # -> {(ukprn, kiscourseid): [values in DETAIL_COLUMNS order]}
+    if courses is not None:
+        ukprns = {ukprn for ukprn, _ in courses}
+
+    def wanted(ukprn, kis_course_id):
+        if courses is not None:
+            return (ukprn, kis_course_id) in courses
+        return ukprns is None or ukprn in ukprns
+
+    if courses is None:
+        courses = {key for key in files.rows('KISCOURSE', ['UKPRN', 'KISCOURSEID']) if wanted(*key)}
+    addresses = providers(files, ukprns)
+    salaries = median_salaries(files, wanted)
+    locations = course_locations(files, wanted)
+    details = {}
+    for key in courses:
+        address = addresses.get(key[0], (None, None))[1]
+        details[key] = [address or None, salaries.get(key), *locations.get(key, (None, None, None))]
+    return details
+
+
+def seed_file(ukprn):
+    # registered universities keep the links csv name scrape_all.py already knows
+    for university in UNIVERSITIES.values():
+        if university.ukprn == ukprn and university.links_url:
+            return os.path.basename(university.links_url)
+    return f"{ukprn}_links_discuni.csv"
+
+
+def write_seeds(files, out_dir=DEFAULT_SEED_DIR, ukprns=None):
+    os.makedirs(out_dir, exist_ok=True)
+    urls = course_urls(files, ukprns)
+    for ukprn, courses in sorted(urls.items()):
+        write_csv_atomic(os.path.join(out_dir, seed_file(ukprn)), ['kiscourseid', 'crseurl'], sorted(courses.items()))
+    print(f"Wrote {sum(len(courses) for courses in urls.values())} course urls for {len(urls)} providers to {out_dir}")
+    return urls
+
+
+def write_details(files, out=DEFAULT_DETAILS, ukprns=None):
+    details = course_details(files, ukprns=ukprns)
+    names = {ukprn: name for ukprn, (name, _) in providers(files, ukprns).items()}
+    rows = ([ukprn, kis_course_id, names.get(ukprn)] + values
+            for (ukprn, kis_course_id), values in sorted(details.items()))
+    write_csv_atomic(out, ['ukprn', 'kiscourseid', 'university_name'] + DETAIL_COLUMNS, rows)
+    print(f"Wrote {len(details)} courses to {out}")
+    return details
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl seeds and course details from the Discover Uni bulk download")
+    commands = parser.add_subparsers(dest='command', required=True)
+    seeds = commands.add_parser('seeds', help="one links csv (kiscourseid,crseurl) per provider")
+    seeds.add_argument('--out', default=DEFAULT_SEED_DIR, help="directory for the links csvs")
+    details = commands.add_parser('details', help="provaddress, median salary and location per course")
+    details.add_argument('--out', default=DEFAULT_DETAILS)
+    for command in (seeds, details):
+        command.add_argument('bulk', help="the Discover Uni zip, or the directory it was unpacked into")
+        command.add_argument('--ukprn', action='append', default=[], help="another provider to include (repeatable)")
+        command.add_argument('--all-providers', action='store_true', help="every provider in the download")
+    args = parser.parse_args(argv)
+
+    load_extractors()  # registers the universities' UKPRNs
+    ukprns = selected_ukprns(args.ukprn, args.all_providers)
+    files = BulkFiles(args.bulk)
+    try:
+        if args.command == 'seeds':
+            write_seeds(files, args.out, ukprns)
+        else:
+            write_details(files, args.out, ukprns)
+    finally:
+        files.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import sys
+
+import pandas as pd
+
+from checkpoint_output import write_csv_atomic
+
+
+# precomputed grade columns for the app
+#
+# app.R used to work out grade_score with sapply(convert_grade_requirement)
+# on every start. this does the same parsing once, vectorised over the whole
+# dataset, and adds:
+#   a_level_grades     the grades as a tuple, "A*|A|A"
+#   grade_score        same points as app.R's grade_to_score (A*=100, A=30, B=10, C=3, D=1, E/U=0)
+#   ib_points          integer IB points ("39 points " -> 39)
+#   non_a_level_route  True when there's an entry requirement but it isn't A-level grades (e.g. "2:1 (or above)")
+#
+#   python normalise_grades.py golden_triangle_dataset_v2.csv   -> adds the columns in place
+#   python normalise_grades.py --check                          -> score SCORE_CASES, exit 1 on a mismatch
+
+GRADE_POINTS = {'A': 30, 'B': 10, 'C': 3, 'D': 1, 'E': 0, 'U': 0}
+A_STAR_POINTS = 100
+
+GRADE_COLUMNS = ['a_level_grades', 'grade_score', 'ib_points', 'non_a_level_route']
+
+# requirement -> grade_score; app.R's convert_grade_requirement must give the same
+# (it used to score "A*A*A*" as 200: strsplit drops the trailing empty piece)
+SCORE_CASES = {
+    'A*A*A*': 300,
+    'A*A*A': 230,
+    'A*AA': 160,
+    'AAA': 90,
+    'AAB': 70,
+    'A*A*': 200,
+    '2:1 (or above)': 0,
+    '': 0,
+}
+
+
+def add_grade_columns(df):
+    df = df.copy()
+    grades = df['a_level_grade_req'].fillna('').astype(str)
+
+    # same rule as convert_grade_requirement: count the A*s, then take the
+    # single grade letters after the last A*
+    a_stars = grades.str.count(r'A\*')
+    remaining = grades.str.rsplit('A*', n=1).str[-1].str.replace(r'[^ABCDEU]', '', regex=True)
+
+    score = a_stars * A_STAR_POINTS
+    for letter, points in GRADE_POINTS.items():
+        if points:
+            score += remaining.str.count(letter) * points
+    df['grade_score'] = score.astype('int64')
+
+    df['a_level_grades'] = [
+        '|'.join(['A*'] * stars + list(rest)) for stars, rest in zip(a_stars, remaining)
+    ]
+
+    if 'ib_grade_req' in df.columns:
+        df['ib_points'] = pd.to_numeric(
+            df['ib_grade_req'].fillna('').astype(str).str.extract(r'(\d{2})', expand=False), errors='coerce'
+        ).astype('Int64')
+    else:
+        df['ib_points'] = pd.array([pd.NA] * len(df), dtype='Int64')
+
+    has_requirement = grades.str.strip() != ''
+    has_a_levels = grades.str.contains(r'\b(?:A\*|[ABCDE]){2,}(?![A-Za-z])', regex=True)
+    df['non_a_level_route'] = has_requirement & ~has_a_levels
+    return df
+
+
+def csv_rows(df):
+    # dataframe -> plain lists for write_csv_atomic, with NA as empty cells
+    return df.astype(object).where(df.notna(), None).values.tolist()
+
+
+def check_scores():
+    scored = add_grade_columns(pd.DataFrame({'a_level_grade_req': list(SCORE_CASES)}))
+    wrong = [(grades, expected, score) for (grades, expected), score in zip(SCORE_CASES.items(), scored['grade_score'])
+             if score != expected]
+    for grades, expected, score in wrong:
+        print(f"MISMATCH: {grades!r} scores {score}, expected {expected}")
+    return not wrong
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add precomputed grade columns to a degree dataset csv")
+    parser.add_argument('input', nargs='?', help="dataset csv (needs a_level_grade_req)")
+    parser.add_argument('--out', default=None, help="where to write (default: overwrite input)")
+    parser.add_argument('--check', action='store_true', help="only score the known cases in SCORE_CASES")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        ok = check_scores()
+        print(f"{len(SCORE_CASES)} cases {'ok' if ok else 'FAILED'}")
+        sys.exit(0 if ok else 1)
+    if args.input is None:
+        parser.error("input is required unless --check")
+
+    df = pd.read_csv(args.input, dtype=str, keep_default_na=False, na_values=[''])
+    df = add_grade_columns(df.drop(columns=[c for c in GRADE_COLUMNS if c in df.columns]))
+    out = args.out or args.input
+    write_csv_atomic(out, list(df.columns), csv_rows(df))
+    print(f"Wrote {len(df)} rows to {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import json
+import mmap
+import os
+import time
+import zlib
+
+
+# append-only archive of every page we fetch, so extractors can be re-run
+# (and diffed against each other) over identical html with no network.
+#
+#   pages.dat  - zlib-compressed bodies, one after another, never rewritten
+#   pages.idx  - one json line per body: url, kiscourseid, source, fetched_at, offset, length
+#
+# the index is small enough to hold in memory; bodies are read through mmap
+
+DEFAULT_DIR = os.path.join('.scrape_cache', 'archive')
+
+
+class PageArchive:
+    def __init__(self, directory=DEFAULT_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.data_path = os.path.join(directory, 'pages.dat')
+        self.index_path = os.path.join(directory, 'pages.idx')
+        self.data = open(self.data_path, 'ab')
+        self.index = open(self.index_path, 'a', encoding='utf-8')
+        self.entries = {}   # url -> [entry, ...] oldest first
+        self.view = None
+        self.view_size = 0
+        self._load_index()
+
+    def _load_index(self):
+        with open(self.index_path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self.entries.setdefault(entry['url'], []).append(entry)
+
+    def append(self, url, html, kiscourseid=None, source=None, fetched_at=None):
+        body = zlib.compress(html.encode('utf-8'))
+        self.data.seek(0, os.SEEK_END)
+        offset = self.data.tell()
+        self.data.write(body)
+        self.data.flush()
+        entry = {
+            'url': url,
+            'kiscourseid': kiscourseid,
+            'source': source,
+            'fetched_at': fetched_at if fetched_at is not None else time.time(),
+            'offset': offset,
+            'length': len(body),
+        }
+        self.index.write(json.dumps(entry) + '\n')
+        self.index.flush()
+        self.entries.setdefault(url, []).append(entry)
+        return entry
+
+    def read(self, entry):
+        end = entry['offset'] + entry['length']
+        if self.view is None or end > self.view_size:
+            # the data file has grown since we last mapped it
+            if self.view is not None:
+                self.view.close()
+            self.view_size = os.path.getsize(self.data_path)
+            with open(self.data_path, 'rb') as f:
+                self.view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return zlib.decompress(self.view[entry['offset']:end]).decode('utf-8')
+
+    def latest(self, url, before=None):
+        # newest copy of url, optionally as it was at time `before`
+        versions = self.entries.get(url, [])
+        if before is not None:
+            versions = [entry for entry in versions if entry['fetched_at'] <= before]
+        if not versions:
+            return None
+        return self.read(versions[-1])
+
+    def latest_entries(self, source=None):
+        # newest entry per url, in first-archived order
+        found = []
+        for versions in self.entries.values():
+            entry = versions[-1]
+            if source is None or entry['source'] == source:
+                found.append(entry)
+        return found
+
+    def close(self):
+        if self.view is not None:
+            self.view.close()
+            self.view = None
+        self.data.close()
+        self.index.close()
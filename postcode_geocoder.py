@@ -0,0 +1,204 @@
+import argparse
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# offline postcode geocoding and campus distances
+#
+# app.R's degree_dist calls the postcodes.io API twice per unique provaddress
+# for every postcode a user types, then runs distHaversine row by row. this
+# does the geocoding offline instead:
+#   build     postcode centroid csv (ONSPD / ukpostcodes.csv) -> sorted table saved as .npy,
+#             opened memory-mapped so a lookup is a binary search over a few pages
+#   campuses  geocodes every course's provaddress once -> campus_locations.csv
+#   distance  one user postcode -> miles and distance band to every campus in one numpy call
+#
+#   python postcode_geocoder.py build ukpostcodes.csv
+#   python postcode_geocoder.py campuses golden_triangle_dataset_v2.csv
+#   python postcode_geocoder.py distance "CB2 1TN"
+
+DEFAULT_TABLE = 'postcode_centroids.npy'
+DEFAULT_CAMPUSES = 'campus_locations.csv'
+
+# postcodes are stored upper case without the space - 7 bytes at most ("SW1A1AA")
+TABLE_DTYPE = np.dtype([('postcode', 'S7'), ('latitude', 'f8'), ('longitude', 'f8')])
+
+POSTCODE_COLUMNS = ['postcode', 'pcds', 'pcd']
+LATITUDE_COLUMNS = ['latitude', 'lat']
+LONGITUDE_COLUMNS = ['longitude', 'long', 'lon']
+
+EARTH_RADIUS_MILES = 6378137 / 1609.34   # same sphere as geosphere::distHaversine
+
+# same bands (and non-breaking hyphens) as the app's distance cards, lower bound inclusive
+BAND_BREAKS = np.array([10, 25, 50, 100, 150])
+BAND_LABELS = np.array(["0‑10 miles", "10‑25 miles", "25‑50 miles", "50‑100 miles", "100‑150 miles", "150+ miles", "Unknown"])
+
+# same as extract_postcode in app.R, but the space is optional
+postcode_pattern = re.compile(r'[A-Z]{1,2}[0-9]{1,2}[A-Z]?\s?[0-9][A-Z]{2}', re.IGNORECASE)
+
+
+def normalise_postcode(postcode):
+    return re.sub(r'\s+', '', str(postcode)).upper()
+
+
+def extract_postcode(address):
+    if not isinstance(address, str):
+        return None
+    match = postcode_pattern.search(address)
+    return normalise_postcode(match.group(0)) if match else None
+
+
+def pick_column(columns, candidates, given=None):
+    if given:
+        return given
+    lowered = {column.lower(): column for column in columns}
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered[candidate]
+    raise ValueError(f"none of {candidates} in the centroid file columns")
+
+
+def build_table(csv_path, out=DEFAULT_TABLE, postcode_column=None, latitude_column=None, longitude_column=None):
+    columns = pd.read_csv(csv_path, nrows=0).columns
+    postcode_column = pick_column(columns, POSTCODE_COLUMNS, postcode_column)
+    latitude_column = pick_column(columns, LATITUDE_COLUMNS, latitude_column)
+    longitude_column = pick_column(columns, LONGITUDE_COLUMNS, longitude_column)
+
+    df = pd.read_csv(
+        csv_path, usecols=[postcode_column, latitude_column, longitude_column],
+        dtype={postcode_column: str}
+    )
+    df = df.dropna()
+    # ONSPD marks postcodes without a grid reference with 99.999999
+    df = df[(df[latitude_column].abs() <= 90) & (df[longitude_column].abs() <= 180)]
+
+    table = np.empty(len(df), dtype=TABLE_DTYPE)
+    table['postcode'] = df[postcode_column].str.replace(r'\s+', '', regex=True).str.upper().str.encode('ascii')
+    table['latitude'] = df[latitude_column].to_numpy()
+    table['longitude'] = df[longitude_column].to_numpy()
+    table.sort(order='postcode')
+
+    # duplicates (e.g. the same postcode in two source rows) - keep the first
+    keep = np.ones(len(table), dtype=bool)
+    keep[1:] = table['postcode'][1:] != table['postcode'][:-1]
+    table = table[keep]
+
+    np.save(out, table)
+    print(f"Wrote {len(table)} postcodes to {out}")
+    return out
+
+
+class PostcodeTable:
+    def __init__(self, path=DEFAULT_TABLE):
+        # memory-mapped: only the pages a binary search touches are read
+        self.table = np.load(path, mmap_mode='r')
+        self.postcodes = self.table['postcode']
+
+    def lookup_many(self, postcodes):
+        # -> (latitudes, longitudes), NaN where the postcode isn't in the table
+        keys = np.array([normalise_postcode(p).encode('ascii', 'ignore')[:8] for p in postcodes], dtype='S8')
+        if len(self.postcodes) == 0:
+            # nothing to find (and no last row to clamp the search positions to)
+            return np.full(len(keys), np.nan), np.full(len(keys), np.nan)
+        positions = np.searchsorted(self.postcodes, keys)
+        positions = np.minimum(positions, len(self.postcodes) - 1)
+        found = self.postcodes[positions] == keys
+        latitudes = np.where(found, self.table['latitude'][positions], np.nan)
+        longitudes = np.where(found, self.table['longitude'][positions], np.nan)
+        return latitudes, longitudes
+
+    def lookup(self, postcode):
+        latitudes, longitudes = self.lookup_many([postcode])
+        if np.isnan(latitudes[0]):
+            return None
+        return float(latitudes[0]), float(longitudes[0])
+
+
+def geocode_campuses(df, table):
+    # one row per unique provaddress with its postcode centroid
+    addresses = df['provaddress'].dropna()
+    addresses = addresses[addresses.str.strip() != ''].unique()
+    campuses = pd.DataFrame({'provaddress': addresses})
+    campuses['postcode'] = campuses['provaddress'].map(extract_postcode)
+    latitudes, longitudes = table.lookup_many(campuses['postcode'].fillna(''))
+    campuses['latitude'] = latitudes
+    campuses['longitude'] = longitudes
+    return campuses
+
+
+def haversine_miles(latitude, longitude, latitudes, longitudes):
+    lat1, lon1 = np.radians(latitude), np.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def distance_bands(miles):
+    bands = np.searchsorted(BAND_BREAKS, miles, side='right')
+    bands[np.isnan(miles)] = len(BAND_LABELS) - 1
+    return BAND_LABELS[bands]
+
+
+class CampusDistances:
+    def __init__(self, campuses_path=DEFAULT_CAMPUSES, table_path=DEFAULT_TABLE):
+        campuses = pd.read_csv(campuses_path)
+        self.provaddress = campuses['provaddress'].to_numpy()
+        self.latitudes = campuses['latitude'].to_numpy(dtype=float)
+        self.longitudes = campuses['longitude'].to_numpy(dtype=float)
+        self.table = PostcodeTable(table_path)
+
+    def from_postcode(self, postcode):
+        # -> dataframe of provaddress, distance_miles, distance_range; None if the postcode is unknown
+        location = self.table.lookup(postcode)
+        if location is None:
+            return None
+        miles = haversine_miles(location[0], location[1], self.latitudes, self.longitudes)
+        return pd.DataFrame({
+            'provaddress': self.provaddress,
+            'distance_miles': miles,
+            'distance_range': distance_bands(miles),
+        })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline postcode geocoding and campus distances")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help="postcode centroid csv -> sorted .npy table")
+    build.add_argument('centroids', help="csv with postcode, latitude and longitude columns")
+    build.add_argument('--out', default=DEFAULT_TABLE)
+    build.add_argument('--postcode-column', default=None)
+    build.add_argument('--latitude-column', default=None)
+    build.add_argument('--longitude-column', default=None)
+
+    campuses = commands.add_parser('campuses', help="geocode every provaddress in a dataset csv")
+    campuses.add_argument('dataset', help="dataset csv with a provaddress column")
+    campuses.add_argument('--table', default=DEFAULT_TABLE)
+    campuses.add_argument('--out', default=DEFAULT_CAMPUSES)
+
+    distance = commands.add_parser('distance', help="distances from one postcode to every campus")
+    distance.add_argument('postcode')
+    distance.add_argument('--table', default=DEFAULT_TABLE)
+    distance.add_argument('--campuses', default=DEFAULT_CAMPUSES)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        build_table(args.centroids, args.out, args.postcode_column, args.latitude_column, args.longitude_column)
+    elif args.command == 'campuses':
+        df = pd.read_csv(args.dataset, dtype=str, keep_default_na=False, na_values=[''])
+        located = geocode_campuses(df, PostcodeTable(args.table))
+        located.to_csv(args.out, index=False)
+        missing = int(located['latitude'].isna().sum())
+        print(f"Geocoded {len(located) - missing} of {len(located)} campus addresses -> {args.out}")
+    else:
+        result = CampusDistances(args.campuses, args.table).from_postcode(args.postcode)
+        if result is None:
+            parser.error(f"unknown postcode {args.postcode}")
+        print(result.sort_values('distance_miles').to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+
+# on-disk http cache for the scrapers
+#
+# stores the body, ETag and Last-Modified for every url we fetch, so the next
+# run can ask "has this changed?" with If-None-Match / If-Modified-Since and
+# get a tiny 304 back instead of the whole page. the extracted row is kept
+# alongside, so an unchanged page doesn't even need re-parsing.
+#
+# most pages do change between runs - nav, banners, news - without their
+# entry requirements changing. so rows are also memoised by the fingerprint of
+# the regions the extractor reads (RuleSet.fingerprint, their exact bytes) and
+# the extractor's version: a page whose requirements are byte for byte the same
+# as any page seen before reuses that row instead of being extracted again. section_hits /
+# section_misses count how often that worked this run.
+
+DEFAULT_PATH = os.path.join('.scrape_cache', 'responses.sqlite')
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60     # after this, drop the entry and refetch in full
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024   # evict least recently used bodies above this
+
+
+class ResponseCache:
+    def __init__(self, path=DEFAULT_PATH, max_age=DEFAULT_MAX_AGE, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        # a commit per page without an fsync each; a crash can lose the last few entries, not corrupt the file
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                body BLOB,
+                size INTEGER,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL,
+                used_at REAL,
+                extractor TEXT,
+                row TEXT
+            )
+        """)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS sections (
+                extractor TEXT,
+                fingerprint TEXT,
+                row TEXT,
+                used_at REAL,
+                PRIMARY KEY (extractor, fingerprint)
+            )
+        """)
+        # memoised rows nobody has matched for max_age (old extractor versions, courses that are gone)
+        self.db.execute('DELETE FROM sections WHERE used_at < ?', (time.time() - max_age,))
+        self.db.commit()
+        self.section_hits = 0
+        self.section_misses = 0
+
+    def get(self, url):
+        # returns (body, etag, last_modified) or None if missing / too old
+        found = self.db.execute(
+            'SELECT body, etag, last_modified, fetched_at FROM responses WHERE url = ?', (url,)
+        ).fetchone()
+        if found is None:
+            return None
+        body, etag, last_modified, fetched_at = found
+        if time.time() - fetched_at > self.max_age:
+            self.db.execute('DELETE FROM responses WHERE url = ?', (url,))
+            self.db.commit()
+            return None
+        self.db.execute('UPDATE responses SET used_at = ? WHERE url = ?', (time.time(), url))
+        self.db.commit()
+        return zlib.decompress(body).decode('utf-8'), etag, last_modified
+
+    def conditional_headers(self, url):
+        cached = self.get(url)
+        if cached is None:
+            return {}
+        _, etag, last_modified = cached
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def put(self, url, body, etag=None, last_modified=None):
+        # a new body means any row extracted from the old one is stale
+        data = zlib.compress(body.encode('utf-8'))
+        now = time.time()
+        self.db.execute(
+            'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, NULL, NULL)',
+            (url, data, len(data), etag, last_modified, now, now)
+        )
+        self.db.commit()
+        self.evict()
+
+    def touch(self, url):
+        # a 304 confirms the cached copy, so restart its max age clock
+        now = time.time()
+        self.db.execute('UPDATE responses SET fetched_at = ?, used_at = ? WHERE url = ?', (now, now, url))
+        self.db.commit()
+
+    def get_row(self, url, extractor):
+        # extractor: name@version, so a 304 never serves a row from older rules
+        found = self.db.execute(
+            'SELECT row FROM responses WHERE url = ? AND extractor = ?', (url, extractor)
+        ).fetchone()
+        if found is None or found[0] is None:
+            return None
+        return json.loads(found[0])
+
+    def put_row(self, url, extractor, row):
+        self.db.execute(
+            'UPDATE responses SET extractor = ?, row = ? WHERE url = ?', (extractor, json.dumps(row), url)
+        )
+        self.db.commit()
+
+    def get_section_row(self, extractor, fingerprint):
+        # extractor: name@version, so rows from older rules are never reused
+        found = self.db.execute(
+            'SELECT row FROM sections WHERE extractor = ? AND fingerprint = ?', (extractor, fingerprint)
+        ).fetchone()
+        if found is None:
+            self.section_misses += 1
+            return None
+        self.section_hits += 1
+        # committed with the put_row that follows a hit
+        self.db.execute('UPDATE sections SET used_at = ? WHERE extractor = ? AND fingerprint = ?',
+                        (time.time(), extractor, fingerprint))
+        return json.loads(found[0])
+
+    def put_section_row(self, extractor, fingerprint, row):
+        self.db.execute('INSERT OR REPLACE INTO sections VALUES (?, ?, ?, ?)',
+                        (extractor, fingerprint, json.dumps(row), time.time()))
+        self.db.commit()
+
+    def evict(self):
+        total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, size in self.db.execute('SELECT url, size FROM responses ORDER BY used_at').fetchall():
+            self.db.execute('DELETE FROM responses WHERE url = ?', (url,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,449 @@
+import hashlib
+import re
+import time
+
+import lxml.html
+from lxml import etree
+
+import telemetry
+
+
+# declarative extraction rules
+#
+# each university describes what to pull out of a page as plain data (xpaths,
+# regexes, templates). compile_rules() turns that into XPath objects and
+# compiled regexes once at import, and RuleSet.extract(doc) runs them.
+#
+# a rule set looks like:
+#
+#   {
+#       'fields': {name: field_rule, ...},        # run against the whole page
+#       'sections': [section_rule, ...],          # locate a block, then run its fields inside it
+#       'regions': [region, ...],                 # optional: only parse these parts of the page
+#   }
+#
+# a field_rule is a dict; the keys are applied in this order:
+#
+#   'if'       field name (or list) that must already be truthy, else None
+#   input      one of 'xpath' (first result), 'from' (another field's value),
+#              'const', 'source': 'page' (whole page text) - default is the section text
+#   'when'     regex that must match the input, else None
+#   'search'   regex; take 'group' (default 1, 'all' for every group) or None
+#   'strip'    strip whitespace
+#   'clean'    list of (pattern, replacement) subs, each followed by strip()
+#   'truncate' cut to n characters and add "..."
+#   'call'     function applied to the value
+#   'remove'   {'field': name, 'word': bool}: drop that field's value from this one
+#   'format'   template over the fields collected so far
+#   'any'      list of alternative rules, the first that gives a non-None value wins
+#
+# a section_rule has 'xpath' (one or a list, tried in order) and 'fields',
+# an optional 'name' (what telemetry reports when it matched),
+# plus optional 'each' (try every matched element until one is accepted),
+# 'contains' (strings its text must contain), 'matches' (regex its text must
+# match), 'require' (fields that must come out non-None for it to count),
+# and text options 'nbsp' (turn \xa0 into spaces) and 'strip'.
+# 'any' on a section gives alternative layouts, the first one found wins.
+#
+# regex flags go inline in the pattern, e.g. '(?is)...'.
+#
+# regions let RuleSet.parse(html) skip the DOM build for everything the rules
+# never look at (nav, news, footers). each region names whole elements in the
+# raw html, found with str.find instead of a parse:
+#
+#   'tag'       element name, or a list - the closest enclosing one is used
+#   'contains'  text the element must contain (default: the first such element)
+#   'attr'      text inside the element's start tag instead, e.g. 'id="entry-requirements"'
+#   'all'       take every match, not just the first
+#
+# the matched elements are parsed as one small document, in page order, and
+# RuleSet.facts(html) extracts from that. str.find only sees the raw markup, so
+# a needle split by a tag or an entity ('<strong>A-levels</strong>:', '&nbsp;')
+# or quoted differently (id='...') finds nothing. so whenever the slice leaves a
+# section (or an 'any' alternative tried before the one that matched) unfound,
+# or a page-level field that reads the document None, each region's needle is
+# searched for again with a loose regex that allows for tags, entities and
+# either quote. if that finds nothing str.find didn't, the page really doesn't
+# have it and the slice's answer stands; otherwise the whole page is parsed and
+# extracted again. fields inside a found section come from the same element
+# either way. the rules have to find everything they read inside the regions -
+# give rules that read the whole page text ('source': 'page') a region too.
+#
+# RuleSet.fingerprint(html) hashes the regions, byte for byte, without a
+# parse: two pages with the same fingerprint whose facts came from the regions
+# alone give the same facts, however much the nav, banners or news around them
+# changed. crawl_engine.py keys its row memo on it.
+
+
+def _compile_regex(pattern):
+    if pattern is None:
+        return None
+    return re.compile(pattern)
+
+
+def _clean_text(text, nbsp=False, strip=False, flatten=False):
+    if strip:
+        text = text.strip()
+    if nbsp:
+        text = text.replace('\xa0', ' ')
+    if flatten:
+        text = text.replace('\n', ' ')
+    return text
+
+
+def _loose_text(text):
+    # the needle as a parse would still see it: tags between its characters, entities, &nbsp; for spaces
+    space = r'(?:\s|&nbsp;|&#0*160;|&#x0*a0;|<[^>]*>)+'
+    tags = r'(?:<[^>]*>)*'
+    parts = []
+    for char in text:
+        if char.isspace():
+            parts.append(space)
+        elif char.isalnum():
+            parts.append(re.escape(char))
+        else:
+            parts.append(f'(?:{re.escape(char)}|&#0*{ord(char)};|&#x0*{ord(char):x};|&[a-z]+;)')
+    return re.compile(tags.join(parts))
+
+
+def _loose_attr(text):
+    # attribute text with either quote (or none) and spaces around '='
+    pattern = re.escape(text).replace('"', '["\']?').replace('=', r'\s*=\s*')
+    return re.compile(pattern)
+
+
+def _tag_pattern(tag):
+    return re.compile(r'<(/?)' + tag + r'(?=[\s/>])', re.IGNORECASE)
+
+
+class Region:
+    def __init__(self, spec):
+        tags = spec.get('tag', [])
+        self.tags = [tags] if isinstance(tags, str) else list(tags)
+        self.contains = spec.get('contains')
+        self.attr = spec.get('attr')
+        self.all = spec.get('all', False)
+        self.patterns = {tag: _tag_pattern(tag) for tag in self.tags}
+        self.needle = self.contains if self.contains is not None else self.attr
+        self.loose = None
+        if self.contains is not None:
+            self.loose = _loose_text(self.contains)
+        elif self.attr is not None:
+            self.loose = _loose_attr(self.attr)
+
+    def complete(self, html):
+        # True if str.find saw every place the needle is: none hidden by a tag, an entity or other quoting
+        if self.loose is None:
+            return True
+        exact = [match.start() for match in re.finditer(re.escape(self.needle), html)]
+        loose = [match.start() for match in self.loose.finditer(html)]
+        return loose[:1] == exact[:1] if not self.all else loose == exact
+
+    def _end(self, html, start, tag):
+        # index just past the element starting at `start`, counting nested tags of the same name
+        depth = 0
+        for match in self.patterns[tag].finditer(html, start):
+            depth += -1 if match.group(1) else 1
+            if depth == 0:
+                close = html.find('>', match.end())
+                return -1 if close < 0 else close + 1
+        return -1
+
+    def _enclosing(self, html, at):
+        # the closest element (of self.tags) that starts before `at` and ends after it
+        best = None
+        for tag in self.tags:
+            pattern = self.patterns[tag]
+            limit = at
+            while True:
+                start = html.rfind('<' + tag, 0, limit)
+                if start < 0 or (best is not None and start <= best[0]):
+                    break
+                if pattern.match(html, start):
+                    end = self._end(html, start, tag)
+                    if end > at:
+                        best = (start, end)
+                        break
+                limit = start
+        return best
+
+    def spans(self, html):
+        spans = []
+        position = 0
+        while True:
+            if self.contains is not None:
+                at = html.find(self.contains, position)
+                span = self._enclosing(html, at) if at >= 0 else None
+            elif self.attr is not None:
+                at = html.find(self.attr, position)
+                start = html.rfind('<', 0, at) if at >= 0 else -1
+                tag = re.match(r'<([a-zA-Z0-9]+)', html[start:start + 20]) if start >= 0 else None
+                span = None
+                if tag:
+                    self.patterns.setdefault(tag.group(1), _tag_pattern(tag.group(1)))
+                    end = self._end(html, start, tag.group(1))
+                    span = (start, end) if end > 0 else None
+            else:
+                span = None
+                for tag in self.tags:
+                    match = self.patterns[tag].search(html, position)
+                    while match and match.group(1):
+                        match = self.patterns[tag].search(html, match.end())
+                    if match:
+                        end = self._end(html, match.start(), tag)
+                        if end > 0 and (span is None or match.start() < span[0]):
+                            span = (match.start(), end)
+            if span is None:
+                return spans
+            spans.append(span)
+            if not self.all:
+                return spans
+            position = max(span[1], position + 1)
+
+
+class FieldRule:
+    def __init__(self, spec):
+        self.spec = spec
+        self.conditions = spec.get('if')
+        if isinstance(self.conditions, str):
+            self.conditions = [self.conditions]
+        self.xpath = etree.XPath(spec['xpath']) if 'xpath' in spec else None
+        self.when = _compile_regex(spec.get('when'))
+        self.search = _compile_regex(spec.get('search'))
+        self.group = spec.get('group', 1)
+        self.clean = [(re.compile(pattern), repl) for pattern, repl in spec.get('clean', [])]
+        self.alternatives = [FieldRule(alt) for alt in spec.get('any', [])]
+        # looks at the document itself, rather than at other fields or constants
+        self.reads_page = (self.xpath is not None or spec.get('source') == 'page'
+                           or any(alternative.reads_page for alternative in self.alternatives))
+
+    def _input(self, scope, values):
+        spec = self.spec
+        if self.xpath is not None:
+            found = self.xpath(scope.element)
+            if isinstance(found, list):
+                return found[0] if found else None
+            return found
+        if 'from' in spec:
+            return values.get(spec['from'])
+        if 'const' in spec:
+            return spec['const']
+        if spec.get('source') == 'page':
+            return scope.page_text(nbsp=spec.get('nbsp', False), flatten=spec.get('flatten', False))
+        return scope.text
+
+    def apply(self, scope, values):
+        spec = self.spec
+        if self.conditions and not all(values.get(name) for name in self.conditions):
+            return None
+
+        if self.alternatives:
+            for alternative in self.alternatives:
+                value = alternative.apply(scope, values)
+                if value is not None:
+                    return value
+            return None
+
+        if 'format' in spec:
+            return spec['format'].format(**values)
+
+        value = self._input(scope, values)
+        if value is None:
+            return None
+        if self.when is not None:
+            if not self.when.search(value):
+                return None
+            value = spec.get('value', value)
+        if self.search is not None:
+            match = self.search.search(value)
+            if not match:
+                return None
+            value = match.groups() if self.group == 'all' else match.group(self.group)
+        if spec.get('strip'):
+            value = value.strip()
+        for pattern, repl in self.clean:
+            value = pattern.sub(repl, value).strip()
+        if 'truncate' in spec and len(value) > spec['truncate']:
+            value = value[:spec['truncate']] + "..."
+        if 'call' in spec:
+            value = spec['call'](value)
+        if 'remove' in spec:
+            removed = values.get(spec['remove']['field'])
+            if removed:
+                if spec['remove'].get('word'):
+                    value = re.sub(r'\b' + re.escape(removed) + r'\b', '', value).strip()
+                else:
+                    value = value.replace(removed, '').strip()
+        return value
+
+
+class Scope:
+    # what field rules run against: an element plus its (normalised) text
+    def __init__(self, element, text=None):
+        self.element = element
+        self.text = text
+        self._page_text = {}
+
+    def page_text(self, nbsp=False, flatten=False):
+        key = (nbsp, flatten)
+        if key not in self._page_text:
+            root = self.element.getroottree().getroot()
+            self._page_text[key] = _clean_text(root.text_content(), nbsp=nbsp, flatten=flatten)
+        return self._page_text[key]
+
+
+class SectionRule:
+    def __init__(self, spec):
+        self.spec = spec
+        self.alternatives = [SectionRule(alt) for alt in spec.get('any', [])]
+        xpaths = spec.get('xpath', [])
+        if isinstance(xpaths, str):
+            xpaths = [xpaths]
+        self.xpaths = [etree.XPath(xpath) for xpath in xpaths]
+        self.matches = _compile_regex(spec.get('matches'))
+        self.fields = {name: FieldRule(rule) for name, rule in spec.get('fields', {}).items()}
+
+    def field_names(self):
+        names = list(self.fields)
+        for alternative in self.alternatives:
+            names += alternative.field_names()
+        return names
+
+    def candidates(self, doc, located):
+        # located caches xpath results per page, so sections sharing a locator only walk the tree once
+        for xpath in self.xpaths:
+            if xpath.path not in located:
+                located[xpath.path] = xpath(doc)
+            elements = located[xpath.path]
+            if not self.spec.get('each'):
+                if elements:
+                    yield elements[0]
+                    return
+                continue
+            yield from elements
+
+    def _text_accepted(self, text):
+        if any(needle not in text for needle in self.spec.get('contains', [])):
+            return False
+        return self.matches is None or self.matches.search(text) is not None
+
+    def apply(self, doc, values, located, missed=None):
+        # returns True if the section was found (its fields are merged into values)
+        # missed, if given, collects the sections (and alternatives) that weren't
+        if self.alternatives:
+            return any(alternative.apply(doc, values, located, missed) for alternative in self.alternatives)
+
+        for element in self.candidates(doc, located):
+            text = _clean_text(element.text_content(), nbsp=self.spec.get('nbsp', False),
+                               strip=self.spec.get('strip', False))
+            if not self._text_accepted(text):
+                continue
+            scope = Scope(element, text)
+            found = dict(values)
+            for name, rule in self.fields.items():
+                found[name] = rule.apply(scope, found)
+            if all(found[name] is not None for name in self.spec.get('require', [])):
+                values.update(found)
+                trace = telemetry.current()
+                if trace is not None and 'name' in self.spec:
+                    trace['matched'].append(self.spec['name'])
+                return True
+        if missed is not None:
+            missed.append(self)
+        return False
+
+
+# set to False to always build the full page (e.g. to compare against the sliced parse)
+SLICE_PAGES = True
+
+
+class RuleSet:
+    def __init__(self, spec):
+        self.fields = {name: FieldRule(rule) for name, rule in spec.get('fields', {}).items()}
+        self.sections = [SectionRule(section) for section in spec.get('sections', [])]
+        self.names = list(self.fields) + [name for section in self.sections for name in section.field_names()]
+        self.regions = [Region(region) for region in spec.get('regions', [])]
+        # page-level fields whose None could just mean "not in the regions"
+        self.page_fields = [name for name, rule in self.fields.items() if rule.reads_page]
+
+    def slice(self, html):
+        # -> just the regions' elements as one small html document, None if none were found
+        spans = sorted(span for region in self.regions for span in region.spans(html))
+        if not spans:
+            return None
+        merged = [list(spans[0])]
+        for start, end in spans[1:]:
+            if start < merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return '<html><body>' + '\n'.join(html[start:end] for start, end in merged) + '</body></html>'
+
+    def fingerprint(self, html):
+        # -> hex digest of the regions, None if there are none to slice (then the whole page matters)
+        sliced = self.slice(html) if self.regions else None
+        if sliced is None:
+            return None
+        # the exact bytes: rules read newlines and spacing ('flatten', regexes over text), so no normalising
+        return hashlib.sha1(sliced.encode('utf-8')).hexdigest()
+
+    def parse(self, html, sliced=False):
+        # html: the page, or its slice (sliced=True, so the trace says which was parsed)
+        started = time.perf_counter()
+        doc = lxml.html.fromstring(html)
+        trace = telemetry.current()
+        if trace is not None:
+            # a slice that fell back to the whole page counts both parses
+            trace['parse_ms'] = round(trace.get('parse_ms', 0) + (time.perf_counter() - started) * 1000, 3)
+            trace['sliced'] = sliced
+        return doc
+
+    def facts(self, html):
+        # -> {field: value} for the page, from its regions when they hold everything the rules look for
+        sliced = self.slice(html) if self.regions and SLICE_PAGES else None
+        if sliced is not None:
+            missed = []
+            values = self.extract(self.parse(sliced, sliced=True), missed)
+            unfound = [name for name in self.page_fields if values[name] is None]
+            if not missed and not unfound:
+                return values
+            # something wasn't in the slice. if every region found all the places its needle is,
+            # the rules would see nothing more on the whole page either
+            trace = telemetry.current()
+            if trace is not None:
+                trace['probed'] = True   # the row depends on more of the page than the regions
+            if all(region.complete(html) for region in self.regions):
+                return values
+            # a needle hidden by markup: its element is missing from the slice, so parse the whole page
+            trace = telemetry.current()
+            if trace is not None:
+                trace['matched'].clear()
+        return self.extract(self.parse(html))
+
+    def extract(self, doc, missed=None):
+        values = dict.fromkeys(self.names)
+        scope = Scope(doc)
+        trace = telemetry.current()
+        if trace is None:
+            for name, rule in self.fields.items():
+                values[name] = rule.apply(scope, values)
+            located = {}
+            for section in self.sections:
+                section.apply(doc, values, located, missed)
+            return values
+
+        # same as above, timing every step for the telemetry log
+        for name, rule in self.fields.items():
+            started = time.perf_counter()
+            values[name] = rule.apply(scope, values)
+            trace['steps'][name] = round((time.perf_counter() - started) * 1000, 3)
+        located = {}
+        for i, section in enumerate(self.sections):
+            started = time.perf_counter()
+            section.apply(doc, values, located, missed)
+            trace['steps'][section.spec.get('name', f'section {i}')] = round((time.perf_counter() - started) * 1000, 3)
+        return values
+
+
+def compile_rules(spec):
+    return RuleSet(spec)
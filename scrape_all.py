@@ -0,0 +1,249 @@
+import argparse
+import csv
+import os
+
+import crawl_engine
+import page_archive
+import response_cache
+import sitemap_discovery
+import telemetry
+from checkpoint_output import CheckpointedCsv, write_csv_atomic
+from scraper_registry import UNIVERSITIES, load_extractors, to_record, output_columns
+
+load_extractors()
+
+
+# one entry point for every university:
+#   python scrape_all.py                 -> everything
+#   python scrape_all.py cam oxford      -> just those two
+#   python scrape_all.py --resume        -> carry on from the last checkpoint after a crash / Ctrl-C
+#   python scrape_all.py --replay --output-dir out/   -> re-run extractors over the archive, no network
+#   python scrape_all.py --parquet       -> also write golden_triangle_dataset.parquet for the app
+#   python scrape_all.py --changed-only  -> only fetch pages the sitemaps say are new or changed
+#   python scrape_all.py --seeds seeds/  -> start from links csvs built by discover_uni.py instead of GitHub's
+#   python scrape_all.py --cache-max-age 86400 --cache-max-bytes 50000000  -> tighter response cache limits
+# all selected universities share one crawl (hosts in parallel) and one writer
+
+
+def load_links(university, seed_dir=None):
+    # seed_dir: links csvs written by discover_uni.py seeds; the GitHub copy is used for any that aren't there
+    import pandas as pd  # only needed here and for --parquet
+    source = university.links_url
+    if seed_dir and os.path.exists(os.path.join(seed_dir, os.path.basename(source))):
+        source = os.path.join(seed_dir, os.path.basename(source))
+    df2 = pd.read_csv(source)
+    return list(zip(df2['kiscourseid'], df2['crseurl']))
+
+
+def output_path(university, output_dir=None):
+    return university.output if output_dir is None else os.path.join(output_dir, university.output)
+
+
+def read_output(university, output_dir=None):
+    # -> {kiscourseid: row} from the last run's csv, {} if there isn't one
+    path = output_path(university, output_dir)
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline='', encoding='utf-8') as f:
+        return {row['kiscourseid']: row for row in csv.DictReader(f)}
+
+
+def write_output(university, records, output_dir=None):
+    path = output_path(university, output_dir)
+    columns = output_columns(university)
+    write_csv_atomic(path, columns, ([record[column] for column in columns] for record in records))
+    print(f"Wrote {len(records)} rows to {path}")
+
+
+def run(keys, use_cache=True, use_archive=True, output_dir=None, resume=False, changed_only=False, telemetry_path=False,
+        seed_dir=None, cache_path=response_cache.DEFAULT_PATH, cache_max_age=response_cache.DEFAULT_MAX_AGE,
+        cache_max_bytes=response_cache.DEFAULT_MAX_BYTES, **engine_options):
+    # telemetry_path: None for the default log under .scrape_cache/telemetry, False for no log
+    jobs = {}
+    links = {}
+    todo = {}
+    writers = {}
+    due = {}
+    fetched = {}
+    failures = {}
+    sitemap_state = sitemap_discovery.load_state() if changed_only else None
+    for key in keys:
+        university = UNIVERSITIES[key]
+        if university.extractor is None:
+            print(f"No scraper for {university.name} yet - keeping {university.output} as is")
+            continue
+        links[key] = load_links(university, seed_dir)
+        writers[key] = CheckpointedCsv(output_path(university, output_dir), output_columns(university), resume=resume)
+        if changed_only and university.sitemap:
+            links[key], due[key], report = sitemap_discovery.schedule(university, links[key], sitemap_state)
+            if report is not None:
+                carry_forward(university, writers[key], links[key], due[key], output_dir)
+                if report['unmapped']:
+                    print(f"{university.name}: {len(report['unmapped'])} course pages in the sitemap have no "
+                          f"kiscourseid yet (python sitemap_discovery.py {key} --out ...)")
+        fetched[key] = {}
+        failures[key] = []
+        # with --resume, courses already in the checkpoint are skipped
+        todo[key] = [(kis_course_id, url) for kis_course_id, url in links[key] if not writers[key].is_done(kis_course_id)]
+        urls = [url for _, url in todo[key]]
+        jobs[key] = (urls, university.extractor, len(university.fields))
+        skipped = len(links[key]) - len(urls)
+        print(f"{university.name}: {len(urls)} pages" + (f" ({skipped} already done)" if skipped else ""))
+
+    cache = response_cache.ResponseCache(cache_path, cache_max_age, cache_max_bytes) if use_cache else None
+    archive = page_archive.PageArchive() if use_archive else None
+    telemetry_log = None
+    if telemetry_path is not False:
+        telemetry_log = telemetry.Telemetry(telemetry_path, fields={key: UNIVERSITIES[key].fields for key in jobs})
+
+    def archive_page(key, i, page):
+        archive.append(page.url, page.text, kiscourseid=str(todo[key][i][0]), source=key)
+
+    def write_row(key, i, facts):
+        kis_course_id, url = todo[key][i]
+        writers[key].write(to_record(UNIVERSITIES[key], kis_course_id, url, facts))
+        if key in due and any(value is not None for value in facts):
+            fetched[key][url] = due[key].get(url)
+
+    def note_failure(key, i, page):
+        # not written or checkpointed, so --resume fetches it again
+        failures[key].append(todo[key][i])
+
+    finished = False
+    try:
+        crawl_engine.scrape_many(
+            jobs, cache=cache, page_hook=archive_page if archive is not None else None, on_row=write_row,
+            on_failure=note_failure, telemetry_log=telemetry_log, rules={key: UNIVERSITIES[key].rules for key in jobs},
+            **engine_options
+        )
+        finished = True
+    finally:
+        if cache is not None:
+            if cache.section_hits or cache.section_misses:
+                print(f"Requirements memo: {cache.section_hits} pages reused, {cache.section_misses} extracted")
+            cache.close()
+        if archive is not None:
+            archive.close()
+        if telemetry_log is not None:
+            telemetry_log.close()
+            print(telemetry_log.summary())
+            print(f"Telemetry written to {telemetry_log.path}")
+        if not finished:
+            # leave .partial/.checkpoint behind for --resume; the real csvs are untouched
+            for writer in writers.values():
+                writer.close()
+
+    for key, writer in writers.items():
+        if failures[key]:
+            # a blank row must never replace a good one: keep the old csv until every page has come in
+            writer.close()
+            print(f"{UNIVERSITIES[key].name}: {len(failures[key])} pages couldn't be fetched - {writer.path} left as it "
+                  f"was, the rest is checkpointed (python scrape_all.py {key} --resume fetches just those)")
+            continue
+        written = writer.finalise(links[key])
+        print(f"Wrote {written} rows to {writer.path}")
+        if sitemap_state is not None:
+            sitemap_discovery.remember(sitemap_state, fetched[key])
+    if sitemap_state is not None:
+        sitemap_discovery.save_state(sitemap_state)
+
+
+def carry_forward(university, writer, links, due, output_dir=None):
+    # courses the sitemap says haven't changed keep last run's row instead of being fetched
+    previous = read_output(university, output_dir)
+    kept = 0
+    for kis_course_id, url in links:
+        row = previous.get(str(kis_course_id))
+        if url in due or row is None or row['url'] != url or writer.is_done(kis_course_id):
+            continue
+        writer.write(row)
+        kept += 1
+    if kept:
+        print(f"{university.name}: {kept} unchanged courses kept from {writer.path}")
+
+
+def replay(keys, output_dir=None, before=None):
+    # run the extractors over the newest archived copy of every page
+    archive = page_archive.PageArchive()
+    try:
+        for key in keys:
+            university = UNIVERSITIES[key]
+            if university.extractor is None:
+                continue
+            records = []
+            for entry in archive.latest_entries(source=key):
+                html = archive.latest(entry['url'], before=before)
+                if html is None:
+                    continue
+                facts = university.extractor(entry['url'], html)
+                records.append(to_record(university, entry['kiscourseid'], entry['url'], facts))
+            write_output(university, records, output_dir)
+    finally:
+        archive.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape degree facts for the golden triangle universities")
+    parser.add_argument('universities', nargs='*',
+                        help=f"which universities to scrape: {', '.join(sorted(UNIVERSITIES))} (default: all)")
+    parser.add_argument('--no-cache', action='store_true', help="ignore the local response cache")
+    parser.add_argument('--cache-max-age', type=float, default=response_cache.DEFAULT_MAX_AGE, metavar='SECONDS',
+                        help="refetch cached pages in full once they are this old")
+    parser.add_argument('--cache-max-bytes', type=int, default=response_cache.DEFAULT_MAX_BYTES, metavar='BYTES',
+                        help="evict the least recently used cached pages above this size")
+    parser.add_argument('--no-archive', action='store_true', help="don't save fetched pages to the archive")
+    parser.add_argument('--resume', action='store_true',
+                        help="skip courses already written by an interrupted run")
+    parser.add_argument('--replay', action='store_true',
+                        help="re-run the extractors over archived pages instead of fetching")
+    parser.add_argument('--before', type=float, default=None,
+                        help="with --replay, use pages as archived at this unix time")
+    parser.add_argument('--changed-only', action='store_true',
+                        help="use the sitemaps' lastmod to only fetch new or changed course pages")
+    parser.add_argument('--telemetry', nargs='?', const=None, default=False, metavar='PATH',
+                        help="log per-page fetch/parse timings as json lines and print a summary at the end")
+    parser.add_argument('--output-dir', default=None, help="write the csvs here instead of the repo root")
+    parser.add_argument('--seeds', default=None, metavar='DIR',
+                        help="links csvs from discover_uni.py seeds, used instead of the GitHub copies")
+    parser.add_argument('--parquet', nargs='?', const=True, default=None, metavar='PATH',
+                        help="also write every university's rows to a typed parquet file (needs pyarrow)")
+    parser.add_argument('--partition', action='store_true', help="with --parquet, one directory per university")
+    parser.add_argument('--per-host', type=int, default=crawl_engine.DEFAULT_PER_HOST,
+                        help="max requests in flight per host")
+    parser.add_argument('--max-per-host', type=int, default=crawl_engine.DEFAULT_MAX_PER_HOST,
+                        help="how far requests in flight per host may grow while the host keeps up")
+    parser.add_argument('--delay', type=float, default=crawl_engine.DEFAULT_DELAY,
+                        help="seconds between request starts per host (robots.txt Crawl-delay wins if longer)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="processes parsing pages while the next ones download (0: parse on the fetch thread)")
+    parser.add_argument('--max-pending', type=int, default=crawl_engine.DEFAULT_MAX_PENDING,
+                        help="with --workers, pages downloaded but not yet parsed before fetching waits")
+    parser.add_argument('--retries', type=int, default=crawl_engine.DEFAULT_RETRIES,
+                        help="retries for a page that timed out or got a 429/5xx")
+    args = parser.parse_args(argv)
+
+    keys = args.universities or sorted(UNIVERSITIES)
+    unknown = [key for key in keys if key not in UNIVERSITIES]
+    if unknown:
+        parser.error(f"unknown universities: {', '.join(unknown)}")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    if args.replay:
+        replay(keys, args.output_dir, args.before)
+    else:
+        run(keys, use_cache=not args.no_cache, use_archive=not args.no_archive, output_dir=args.output_dir,
+            resume=args.resume, changed_only=args.changed_only, seed_dir=args.seeds,
+            cache_max_age=args.cache_max_age, cache_max_bytes=args.cache_max_bytes,
+            telemetry_path=args.telemetry, per_host=args.per_host, delay=args.delay,
+            max_per_host=args.max_per_host, retries=args.retries, verbose=True,
+            workers=args.workers, max_pending=args.max_pending)
+    if args.parquet:
+        import columnar_output
+        path = columnar_output.DEFAULT_OUTPUT if args.parquet is True else args.parquet
+        columnar_output.write_parquet(columnar_output.load_university_outputs(output_dir=args.output_dir),
+                                      path, partition=args.partition)
+    print("Done!")
+
+
+if __name__ == '__main__':
+    main()
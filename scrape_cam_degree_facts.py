@@ -1,94 +1,82 @@
-import requests
-import lxml.html
-import pandas as pd
-import re
-import time
+import telemetry
+from rule_engine import compile_rules
+from scraper_registry import register, DEFAULT_FIELDS
 
-def cambridge_degree_facts(url):
-    try:
-        html = requests.get(url, timeout=15).text
-        doc = lxml.html.fromstring(html)
 
-        # 1. TITLE (always BA at Cambridge)
-        degree_title_results = doc.xpath('//h1/text()')
-        if degree_title_results:
-            full_title = degree_title_results[0].strip()
-            clean_title = re.sub(r',\s*BA\s*\(Hons\)\s*$', '', full_title).strip()
-            degree_type = 'BA'
-        else:
-            clean_title = None
-            degree_type = None
+# extraction rules, compiled once at import (see rule_engine.py for the format)
 
-        a_level_grade_req = None
-        a_level_subject_reqs = None
-        ib_grade_req = None
-        ib_subject_req = None
+cambridge_rules = compile_rules({
+    'fields': {
+        # 1. TITLE (always BA at Cambridge)
+        'title_text': {'xpath': '//h1/text()'},
+        'degree_type': {'if': 'title_text', 'const': 'BA'},
+        'degree_title': {'from': 'title_text', 'strip': True, 'clean': [(r',\s*BA\s*\(Hons\)\s*$', '')]},
+    },
+    'sections': [
+        # 2. FIND THE ENTRY REQUIREMENTS SECTION - everything below searches only inside it
+        {
+            'name': 'entry requirements',
+            'xpath': [
+                '//*[@id="entry-requirements"]',
+                '//*[contains(@class, "field-entry-overview")]',
+                '//*[contains(@class, "entry-requirements")]'
+            ],
+            'nbsp': True,
+            'fields': {
+                # 3. EXTRACT A-LEVEL GRADE (basic)
+                'a_level_grade_req': {'search': r'A level:\s*([A*ABCDE]{3,4})'},
 
-        # 2. FIND THE ENTRY REQUIREMENTS SECTION
-        requirement_selectors = [
-            '//*[@id="entry-requirements"]',
-            '//*[contains(@class, "field-entry-overview")]',
-            '//*[contains(@class, "entry-requirements")]'
-        ]
-        
-        requirements_text = None
-        for selector in requirement_selectors:
-            elements = doc.xpath(selector)
-            if elements:
-                requirements_text = elements[0].text_content().replace('\xa0', ' ')
-                break
+                # 4. EXTRACT A-LEVEL SUBJECT REQUIREMENTS (handle multiple patterns)
+                'subject_requirements': {'any': [
+                    # Pattern 1: "you will need" (like Modern Languages)
+                    {'search': r'(?s)you will need[^:]*:\s*(.*?)(?=We also recommend|College entry|$)',
+                     'clean': [(r'\s+', ' '), (r'[\t\n•]', '')]},
+                    # Pattern 2: "We don't ask for any specific subjects" (like Land Economy)
+                    {'when': r"We don't ask for any specific subjects", 'value': "No specific subjects required"},
+                    # Pattern 3: Look for other subject requirement patterns
+                    {'when': r'(?i)specific subjects?.*?(?:required|needed)',
+                     'search': r'(?is)(specific subjects?.*?)(?=College entry|$)',
+                     'clean': [(r'\s+', ' ')], 'truncate': 100},
+                ]},
 
-        if requirements_text:
-            # REMOVED DEBUG PRINT - no more spam!
-            
-            # 3. EXTRACT A-LEVEL GRADE (basic)
-            alevel_grade_match = re.search(r'A level:\s*([A*ABCDE]{3,4})', requirements_text)
-            if alevel_grade_match:
-                a_level_grade_req = alevel_grade_match.group(1)
-            
-            # 4. EXTRACT A-LEVEL SUBJECT REQUIREMENTS (handle multiple patterns)
-            subject_requirements = None
-            
-            # Pattern 1: "you will need" (like Modern Languages)
-            required_match = re.search(r'you will need[^:]*:\s*(.*?)(?=We also recommend|College entry|$)', requirements_text, re.DOTALL)
-            if required_match:
-                required_text = required_match.group(1)
-                clean_required = re.sub(r'\s+', ' ', required_text).strip()
-                clean_required = re.sub(r'[\t\n•]', '', clean_required).strip()
-                subject_requirements = clean_required
-            
-            # Pattern 2: "We don't ask for any specific subjects" (like Land Economy)
-            elif re.search(r"We don't ask for any specific subjects", requirements_text):
-                subject_requirements = "No specific subjects required"
-            
-            # Pattern 3: Look for other subject requirement patterns
-            elif re.search(r'specific subjects?.*?(?:required|needed)', requirements_text, re.IGNORECASE):
-                subject_match = re.search(r'(specific subjects?.*?)(?=College entry|$)', requirements_text, re.DOTALL | re.IGNORECASE)
-                if subject_match:
-                    subject_text = subject_match.group(1)
-                    clean_subject = re.sub(r'\s+', ' ', subject_text).strip()
-                    subject_requirements = clean_subject[:100] + "..." if len(clean_subject) > 100 else clean_subject
+                # Format A-level requirements
+                'a_level_subject_reqs': {'any': [
+                    {'if': 'subject_requirements', 'format': '{a_level_grade_req} - {subject_requirements}'},
+                    {'from': 'a_level_grade_req'},
+                ]},
 
-            # Format A-level requirements
-            if subject_requirements:
-                a_level_subject_reqs = f"{a_level_grade_req} - {subject_requirements}"
-            else:
-                a_level_subject_reqs = a_level_grade_req
+                # 5. EXTRACT IB (same logic)
+                'ib_grade_req': {'search': r'IB:\s*(\d{2})'},
+                'ib_subject_req': {'if': 'ib_grade_req', 'any': [
+                    {'if': 'subject_requirements', 'format': '{ib_grade_req} points - {subject_requirements}'},
+                    {'format': '{ib_grade_req} points'},
+                ]},
+            },
+        },
+    ],
+    'regions': [
+        {'tag': 'h1'},
+        {'attr': 'entry-requirements', 'all': True},
+        {'attr': 'field-entry-overview', 'all': True},
+    ],
+})
 
-            # 5. EXTRACT IB (same logic)
-            ib_grade_match = re.search(r'IB:\s*(\d{2})', requirements_text)
-            if ib_grade_match:
-                ib_grade_req = ib_grade_match.group(1)
-                
-                if subject_requirements:
-                    ib_subject_req = f"{ib_grade_req} points - {subject_requirements}"
-                else:
-                    ib_subject_req = f"{ib_grade_req} points"
 
-        return [degree_type, clean_title, a_level_grade_req, a_level_subject_reqs, ib_grade_req, ib_subject_req]
+@register('cam', 'University of Cambridge', 'cam_links_discuni.csv', 'cambridge_degree_facts.csv',
+          sitemap='https://www.undergraduate.study.cam.ac.uk/sitemap.xml',
+          course_pattern=r'^https://www\.undergraduate\.study\.cam\.ac\.uk/courses/[a-z0-9-]+/?$',
+          ukprn='10007788', rules=cambridge_rules)
+def cambridge_degree_facts(url, html=None):
+    try:
+        if html is None:
+            import crawl_engine  # only for a standalone fetch - keeps asyncio/requests out of parse workers
+            html = crawl_engine.fetch_html(url)
+        facts = cambridge_rules.facts(html)
+        return [facts[field] for field in DEFAULT_FIELDS]
 
     except Exception as e:
         print(f"Error scraping {url}: {e}")
+        telemetry.note_error(e)
         return [None, None, None, None, None, None]
 # # Test the scraper
 # urls = [
@@ -101,25 +89,7 @@ def cambridge_degree_facts(url):
 #     result = cambridge_degree_facts(url)
 #     print(f"Result: {result}")
 
-# Mass scraping (uncomment when ready)
-df2 = pd.read_csv("https://raw.githubusercontent.com/Danjones-DJ/Degree-Matchmaker_DJ/refs/heads/main/cam_links_discuni.csv")
-
-results = []
-for index, row in df2.iterrows():  # Changed: iterate over rows to get both columns
-    url = row['crseurl']
-    kis_course_id = row['kiscourseid']  # Get the KISCOURSEID
-    
-    print(f"Scraping: {url}")
-    facts = cambridge_degree_facts(url)
-    
-    # Include both KISCOURSEID and URL in results
-    results.append([kis_course_id, url] + facts)
-    time.sleep(1)
-
-# Create dataframe with KISCOURSEID as first column
-columns = ['kiscourseid', 'url', 'degree_type', 'degree_title', 'a_level_grade_req', 'a_level_subject_reqs', 'ib_grade_req', 'ib_subject_req']
-final_df = pd.DataFrame(results, columns=columns)
-
-# Save
-final_df.to_csv('cambridge_degree_facts.csv', index=False)
-print("Done!")
\ No newline at end of file
+# mass scraping lives in scrape_all.py (shared fetch pipeline + writer)
+if __name__ == '__main__':
+    import scrape_all
+    scrape_all.main(['cam'])
@@ -1,19 +1,21 @@
-import requests
-import lxml.html
-import pandas as pd
 import re
-import time
+
+import telemetry
+from rule_engine import compile_rules
+from scraper_registry import register, DEFAULT_FIELDS
 
 
 # janitor duty 
 
+# Use word boundaries to match complete degree types only
+degree_pattern = re.compile(r'\b(BSc|BA|BEng|MEng|MSc|MA|PhD|MPhil|LLB|LLM|MB|MBBS|MD|BDS|DDS|PharmD|MSCi|MPharm|DVM|JD)\b', re.IGNORECASE)
+
+
 def extract_degree_type(title):
     if not title:
         return None
     
-    # Use word boundaries to match complete degree types only
-    degree_pattern = r'\b(BSc|BA|BEng|MEng|MSc|MA|PhD|MPhil|LLB|LLM|MB|MBBS|MD|BDS|DDS|PharmD|MSCi|MPharm|DVM|JD)\b'
-    match = re.search(degree_pattern, title, flags=re.IGNORECASE)
+    match = degree_pattern.search(title)
     
     if match:
         return match.group(1)  # Return JUST the degree type, not group(0)
@@ -21,66 +23,66 @@ def extract_degree_type(title):
         return None
     
 
- 
-# function
-def lse_degree_facts(url):
-    try:
-        html = requests.get(url, timeout=15).text
-        doc = lxml.html.fromstring(html)
+# extraction rules, compiled once at import (see rule_engine.py for the format)
 
+lse_rules = compile_rules({
+    'fields': {
         # 1. TITLE + TYPE
-        degree_title_results = doc.xpath('//*[@id="main"]/div/div[1]/div[2]/div/h1/span/text()')
-        
-        if degree_title_results:
-            full_title = degree_title_results[0]  # 'BSc Mathematics with Economics'
-            degree_type = extract_degree_type(full_title)  # 'BSc'
-            
-            # Remove degree type from anywhere in title
-            if degree_type:
-                clean_title = re.sub(r'\b' + re.escape(degree_type) + r'\b', '', full_title).strip()
-            else:
-                clean_title = full_title
-        else:
-            clean_title = None
-            degree_type = None
-
-        # 2. GET ALL PARAGRAPHS FROM ENTRY REQUIREMENTS
-        all_paragraphs = doc.xpath('//*[@id="entry-requirement__home"]//p')
-        
-        # 3. FIND A-LEVEL REQUIREMENTS (look for A-level grade patterns)
-        a_level_grade_req = None
-        a_level_subject_reqs = None
-        
-        for p in all_paragraphs:
-            text = p.text_content().strip()
-            
-            # Look for A-level grades (A*AA, AAA, etc.) - should be P3 from debug
-            if re.search(r'^[A*ABCDE]{3,4}', text):
-                # Extract the grade part
-                grade_match = re.search(r'^([A*ABCDE]{3,4})', text)
-                a_level_grade_req = grade_match.group(1) if grade_match else None
-                a_level_subject_reqs = text  # Full text
-                break
-
+        'title_text': {'xpath': '//*[@id="main"]/div/div[1]/div[2]/div/h1/span/text()'},  # 'BSc Mathematics with Economics'
+        'degree_type': {'from': 'title_text', 'call': extract_degree_type},  # 'BSc'
+        # Remove degree type from anywhere in title
+        'degree_title': {'from': 'title_text', 'remove': {'field': 'degree_type', 'word': True}},
+    },
+    'sections': [
+        # 2./3. FIND A-LEVEL REQUIREMENTS (first entry requirements paragraph starting with a grade)
+        {
+            'name': 'a level',
+            'xpath': '//*[@id="entry-requirement__home"]//p',
+            'each': True,
+            'strip': True,
+            'matches': r'^[A*ABCDE]{3,4}',
+            'fields': {
+                'a_level_grade_req': {'search': r'^([A*ABCDE]{3,4})'},
+                'a_level_subject_reqs': {},  # Full text
+            },
+        },
         # 4. FIND IB REQUIREMENTS (look for "points overall")
-        ib_grade_req = None
-        ib_subject_req = None
-        
-        for p in all_paragraphs:
-            text = p.text_content().strip()
-            
-            # Look for IB points - should be P10 from debug
-            if 'points overall' in text:
-                # Extract the points number
-                points_match = re.search(r'^(\d{2})', text)
-                ib_grade_req = points_match.group(1) if points_match else None
-                ib_subject_req = text  # Full text
-                break
+        {
+            'name': 'ib',
+            'xpath': '//*[@id="entry-requirement__home"]//p',
+            'each': True,
+            'strip': True,
+            'contains': ['points overall'],
+            'fields': {
+                'ib_grade_req': {'search': r'^(\d{2})'},
+                'ib_subject_req': {},  # Full text
+            },
+        },
+    ],
+    # the title xpath is positional from #main, so keep those elements whole
+    'regions': [
+        {'attr': 'id="main"', 'all': True},
+        {'attr': 'id="entry-requirement__home"', 'all': True},
+    ],
+})
 
-        return [degree_type, clean_title, a_level_grade_req, a_level_subject_reqs, ib_grade_req, ib_subject_req]
+ 
+# function
+@register('lse', 'London School of Economics', 'lse_links_discuni.csv', 'lse_degree_facts.csv',
+          sitemap='https://www.lse.ac.uk/sitemap.xml',
+          course_pattern=r'^https://www\.lse\.ac\.uk/study-at-lse/undergraduate/[a-z0-9-]+/?$',
+          ukprn='10004063', rules=lse_rules)
+def lse_degree_facts(url, html=None):
+    try:
+        if html is None:
+            import crawl_engine  # only for a standalone fetch - keeps asyncio/requests out of parse workers
+            html = crawl_engine.fetch_html(url)
+        facts = lse_rules.facts(html)
+        return [facts[field] for field in DEFAULT_FIELDS]
 
     except Exception as e:
         print(f"Error scraping {url}: {e}")
+        telemetry.note_error(e)
         return [None, None, None, None, None, None]
 
 
@@ -89,26 +91,7 @@ def lse_degree_facts(url):
 # result = lse_degree_facts(url)
 # print(result)
 
-# #
-df2 = pd.read_csv("https://raw.githubusercontent.com/Danjones-DJ/Degree-Matchmaker_DJ/refs/heads/main/lse_links_discuni.csv")
-
-results = []
-for index, row in df2.iterrows():  # Changed: iterate over rows to get both columns
-    url = row['crseurl']
-    kis_course_id = row['kiscourseid']  # Get the kiscourseid (lowercase)
-    
-    print(f"Scraping: {url}")
-    facts = lse_degree_facts(url)
-    
-    # Include both kiscourseid and URL in results
-    results.append([kis_course_id, url] + facts)
-    time.sleep(1)
-
-# Create dataframe with kiscourseid as first column
-columns = ['kiscourseid', 'url', 'degree_type', 'degree_title', 'a_level_grade_req', 'a_level_subject_reqs', 'ib_grade_req', 'ib_subject_req']
-final_df = pd.DataFrame(results, columns=columns)
-
-# Save
-final_df.to_csv('lse_degree_facts.csv', index=False)
-print("Done!")
-
+# mass scraping lives in scrape_all.py (shared fetch pipeline + writer)
+if __name__ == '__main__':
+    import scrape_all
+    scrape_all.main(['lse'])
@@ -1,237 +1,112 @@
-import requests
-import lxml.html
-import pandas as pd
-import re
-import time
 
+import telemetry
+from rule_engine import compile_rules
+from scraper_registry import register
 
 
+oxford_fields = ['degree_type', 'optional_degree_type', 'degree_title', 'a_level_grade_req', 'a_level_subject_reqs', 'ib_grade_req', 'ib_subject_req']
 
 
-def oxford_degree_facts(url):
-    try:
-        html = requests.get(url, timeout=15).text
-        doc = lxml.html.fromstring(html)
-
-        # 1. TITLE (always BA at Oxford)
-        degree_title_results = doc.xpath('//h1/text()')
-        if degree_title_results:
-            clean_title = degree_title_results[0]
-            degree_type = 'BA'
-        else:
-            clean_title = None
-            degree_type = None
-
-        a_level_grade_req = None
-        a_level_subject_reqs = None
-        ib_grade_req = None
-        ib_subject_req = None
-
-        # 2. TRY TABLE FORMAT FIRST
-        tables = doc.xpath('//table')
-        table_text_found = False
-        
-        for table in tables:
-            table_text = table.text_content().replace('\xa0', ' ')
-            if 'A-levels:' in table_text and 'International Baccalaureate' in table_text:
-                table_text_found = True
-                
-                # FIXED: Extract A-level part ONLY (use .*? instead of [^A]*?)
-                alevel_match = re.search(r'A-levels:\s*(.*?)(?=Advanced Highers|International)', table_text)
-                if alevel_match:
-                    alevel_text = alevel_match.group(1).strip()
-                    grade_match = re.search(r'([A*ABCDE]{3,5})', alevel_text)
-                    if grade_match:
-                        a_level_grade_req = grade_match.group(1)
-                        a_level_subject_reqs = alevel_text
-
-                
-                # FIXED: Extract IB part ONLY (use .*? instead of [^A]*?)
-                ib_match = re.search(r'International Baccalaureate \(IB\):\s*(.*?)(?=Advanced diploma|Any other|$)', table_text)
-                if ib_match:
-                    ib_text = ib_match.group(1).strip()
-                    points_match = re.search(r'(\d{2})', ib_text)
-                    if points_match:
-                        ib_grade_req = points_match.group(1)
-                        ib_subject_req = ib_text
-                break
-
-        # 3. FALL BACK TO PARAGRAPH FORMAT (if no table found)
-        if not table_text_found:
-            all_paragraphs = doc.xpath('//p[@class="audience-copy"]')
-            
-            for p in all_paragraphs:
-                text = p.text_content().strip().replace('\xa0', ' ')
-                
-                if 'Entrance requirements:' in text and re.search(r'[A*ABCDE]{3,5}', text):
-                    req_match = re.search(r'Entrance requirements:\s*([^.]*\.)', text)
-                    if req_match:
-                        alevel_text = req_match.group(1).strip()
-                        grade_match = re.search(r'([A*ABCDE]{3,5})', alevel_text)
-                        if grade_match:
-                            a_level_grade_req = grade_match.group(1)
-                            a_level_subject_reqs = alevel_text
-                            break
-
-        return [degree_type, clean_title, a_level_grade_req, a_level_subject_reqs, ib_grade_req, ib_subject_req]
-
-    except Exception as e:
-        print(f"Error scraping {url}: {e}")
-        return [None, None, None, None, None, None]
-
-url = "https://www.ox.ac.uk/admissions/undergraduate/courses/course-listing/computer-science-and-philosophy"
-result = oxford_degree_facts(url)
-print(result)
-
-
-
-
-
-
-# df2 = pd.read_csv("https://raw.githubusercontent.com/Danjones-DJ/Degree-Matchmaker_DJ/refs/heads/main/oxf_links_discuni.csv")
-
-# results = []
-# for index, row in df2.iterrows():  # Changed: iterate over rows to get both columns
-#     url = row['crseurl']
-#     kis_course_id = row['kiscourseid']  # Get the kiscourseid (lowercase)
-    
-#     print(f"Scraping: {url}")
-#     facts = oxford_degree_facts(url)
+def longer_duration(groups):
+    years1, type1, years2, type2 = groups
     
-#     # Include both kiscourseid and URL in results
-#     results.append([kis_course_id, url] + facts)
-#     time.sleep(1)
-
-# # Create dataframe with kiscourseid as first column
-# columns = ['kiscourseid', 'url', 'degree_type', 'degree_title', 'a_level_grade_req', 'a_level_subject_reqs', 'ib_grade_req', 'ib_subject_req']
-# final_df = pd.DataFrame(results, columns=columns)
-
-# # Save
-# final_df.to_csv('oxford_degree_facts.csv', index=False)
-# print("Done!")
-
+    # The longer duration is the optional degree type
+    if int(years1) > int(years2):
+        return type1.strip()
+    else:
+        return type2.strip()
 
 
-import requests
-import lxml.html
-import re
+# extraction rules, compiled once at import (see rule_engine.py for the format)
 
-def oxford_degree_facts(url):
-    try:
-        html = requests.get(url, timeout=15).text
-        doc = lxml.html.fromstring(html)
-        
+oxford_rules = compile_rules({
+    'fields': {
         # 1. TITLE (always BA at Oxford)
-        degree_title_results = doc.xpath('//h1/text()')
-        if degree_title_results:
-            clean_title = degree_title_results[0]
-            degree_type = 'BA'
-        else:
-            clean_title = None
-            degree_type = None
-            
-        a_level_grade_req = None
-        a_level_subject_reqs = None
-        ib_grade_req = None
-        ib_subject_req = None
-        
-        # 2. TRY TABLE FORMAT FIRST
-        tables = doc.xpath('//table')
-        table_text_found = False
-        
-        for table in tables:
-            table_text = table.text_content().replace('\xa0', ' ')
-            if 'A-levels:' in table_text and 'International Baccalaureate' in table_text:
-                table_text_found = True
-                
-                # FIXED: Extract A-level part ONLY (use .*? instead of [^A]*?)
-                alevel_match = re.search(r'A-levels:\s*(.*?)(?=Advanced Highers|International)', table_text)
-                if alevel_match:
-                    alevel_text = alevel_match.group(1).strip()
-                    grade_match = re.search(r'([A*ABCDE]{3,5})', alevel_text)
-                    if grade_match:
-                        a_level_grade_req = grade_match.group(1)
-                        a_level_subject_reqs = alevel_text
-                
-                # FIXED: Extract IB part ONLY (use .*? instead of [^A]*?)
-                ib_match = re.search(r'International Baccalaureate \(IB\):\s*(.*?)(?=Advanced diploma|Any other|$)', table_text)
-                if ib_match:
-                    ib_text = ib_match.group(1).strip()
-                    points_match = re.search(r'(\d{2})', ib_text)
-                    if points_match:
-                        ib_grade_req = points_match.group(1)
-                        ib_subject_req = ib_text
-                break
-                
-        # 3. FALL BACK TO PARAGRAPH FORMAT (if no table found)
-        if not table_text_found:
-            all_paragraphs = doc.xpath('//p[@class="audience-copy"]')
-            
-            for p in all_paragraphs:
-                text = p.text_content().strip().replace('\xa0', ' ')
-                
-                if 'Entrance requirements:' in text and re.search(r'[A*ABCDE]{3,5}', text):
-                    req_match = re.search(r'Entrance requirements:\s*([^.]*\.)', text)
-                    if req_match:
-                        alevel_text = req_match.group(1).strip()
-                        grade_match = re.search(r'([A*ABCDE]{3,5})', alevel_text)
-                        if grade_match:
-                            a_level_grade_req = grade_match.group(1)
-                            a_level_subject_reqs = alevel_text
-                            break
-        
-        # NEW SECTION: Get optional degree type
-        optional_degree_type = None
-        page_text = doc.text_content().replace('\xa0', ' ').replace('\n', ' ')
-        
-        # Look for duration patterns
-        duration_patterns = [
-            r'Course duration:\s*(\d+)\s*years?\s*\(([^)]+)\);\s*(\d+)\s*years?\s*\(([^)]+)\)',
-            r'(\d+)\s*years?\s*\(([^)]+)\)\s*or\s*(\d+)\s*years?\s*\(([^)]+)\)',
-            r'studied for\s*(\d+)\s*years?\s*\(([^)]+)\)\s*or\s*(\d+)\s*years?[^(]*\(([^)]+)\)'
-        ]
-        
-        for pattern in duration_patterns:
-            match = re.search(pattern, page_text, re.IGNORECASE)
-            if match:
-                years1, type1, years2, type2 = match.groups()
-                
-                # The longer duration is the optional degree type
-                if int(years1) > int(years2):
-                    optional_degree_type = type1.strip()
-                else:
-                    optional_degree_type = type2.strip()
-                break
-                            
-        return [degree_type, optional_degree_type, clean_title, a_level_grade_req, a_level_subject_reqs, ib_grade_req, ib_subject_req]
+        'degree_title': {'xpath': '//h1/text()'},
+        'degree_type': {'if': 'degree_title', 'const': 'BA'},
+
+        # NEW SECTION: Get optional degree type from the duration patterns
+        'optional_degree_type': {'any': [
+            {'source': 'page', 'nbsp': True, 'flatten': True, 'group': 'all', 'call': longer_duration, 'search': pattern}
+            for pattern in [
+                r'(?i)Course duration:\s*(\d+)\s*years?\s*\(([^)]+)\);\s*(\d+)\s*years?\s*\(([^)]+)\)',
+                r'(?i)(\d+)\s*years?\s*\(([^)]+)\)\s*or\s*(\d+)\s*years?\s*\(([^)]+)\)',
+                r'(?i)studied for\s*(\d+)\s*years?\s*\(([^)]+)\)\s*or\s*(\d+)\s*years?[^(]*\(([^)]+)\)'
+            ]
+        ]},
+    },
+    'sections': [
+        {'name': 'requirements', 'any': [
+            # 2. TRY TABLE FORMAT FIRST
+            {
+                'name': 'table',
+                'xpath': '//table',
+                'each': True,
+                'nbsp': True,
+                'contains': ['A-levels:', 'International Baccalaureate'],
+                'fields': {
+                    # Extract A-level part ONLY
+                    'alevel_text': {'search': r'A-levels:\s*(.*?)(?=Advanced Highers|International)', 'strip': True},
+                    'a_level_grade_req': {'from': 'alevel_text', 'search': r'([A*ABCDE]{3,5})'},
+                    'a_level_subject_reqs': {'if': 'a_level_grade_req', 'from': 'alevel_text'},
+                    # Extract IB part ONLY
+                    'ib_text': {'search': r'International Baccalaureate \(IB\):\s*(.*?)(?=Advanced diploma|Any other|$)', 'strip': True},
+                    'ib_grade_req': {'from': 'ib_text', 'search': r'(\d{2})'},
+                    'ib_subject_req': {'if': 'ib_grade_req', 'from': 'ib_text'},
+                },
+            },
+            # 3. FALL BACK TO PARAGRAPH FORMAT (if no table found)
+            {
+                'name': 'paragraph',
+                'xpath': '//p[@class="audience-copy"]',
+                'each': True,
+                'strip': True,
+                'nbsp': True,
+                'contains': ['Entrance requirements:'],
+                'matches': r'[A*ABCDE]{3,5}',
+                'require': ['a_level_grade_req'],
+                'fields': {
+                    'alevel_text': {'search': r'Entrance requirements:\s*([^.]*\.)', 'strip': True},
+                    'a_level_grade_req': {'from': 'alevel_text', 'search': r'([A*ABCDE]{3,5})'},
+                    'a_level_subject_reqs': {'if': 'a_level_grade_req', 'from': 'alevel_text'},
+                },
+            },
+        ]},
+    ],
+    # only the title, the requirements table/paragraph and the duration line are read
+    'regions': [
+        {'tag': 'h1'},
+        {'tag': 'table', 'contains': 'A-levels:', 'all': True},
+        {'tag': 'p', 'contains': 'Entrance requirements:', 'all': True},
+        {'tag': ['p', 'li', 'dl', 'div'], 'contains': 'Course duration', 'all': True},
+        {'tag': ['p', 'li', 'dl', 'div'], 'contains': 'years (', 'all': True},
+    ],
+})
+
+
+@register('oxford', 'University of Oxford', 'oxf_links_discuni.csv', 'oxford_degree_facts.csv', fields=oxford_fields,
+          sitemap='https://www.ox.ac.uk/sitemap.xml',
+          course_pattern=r'^https://www\.ox\.ac\.uk/admissions/undergraduate/courses/course-listing/[a-z0-9-]+/?$',
+          ukprn='10007774', rules=oxford_rules)
+def oxford_degree_facts(url, html=None):
+    try:
+        if html is None:
+            import crawl_engine  # only for a standalone fetch - keeps asyncio/requests out of parse workers
+            html = crawl_engine.fetch_html(url)
+        facts = oxford_rules.facts(html)
+        return [facts[field] for field in oxford_fields]
         
     except Exception as e:
         print(f"Error scraping {url}: {e}")
+        telemetry.note_error(e)
         return [None, None, None, None, None, None, None]
 
-# Test the function
-url = "https://www.ox.ac.uk/admissions/undergraduate/courses/course-listing/computer-science-and-philosophy"
-result = oxford_degree_facts(url)
-print("Results:", result)
-
-df2 = pd.read_csv("https://raw.githubusercontent.com/Danjones-DJ/Degree-Matchmaker_DJ/refs/heads/main/oxf_links_discuni.csv")
-
-results = []
-for index, row in df2.iterrows():
-    url = row['crseurl']
-    kis_course_id = row['kiscourseid']
-    
-    print(f"Scraping: {url}")
-    facts = oxford_degree_facts(url)
-    
-    # Include both kiscourseid and URL in results
-    results.append([kis_course_id, url] + facts)
-    time.sleep(1)
-
-# Updated columns to match the new 7-column return format
-columns = ['kiscourseid', 'url', 'degree_type', 'optional_degree_type', 'degree_title', 'a_level_grade_req', 'a_level_subject_reqs', 'ib_grade_req', 'ib_subject_req']
-final_df = pd.DataFrame(results, columns=columns)
+# # Test the function
+# url = "https://www.ox.ac.uk/admissions/undergraduate/courses/course-listing/computer-science-and-philosophy"
+# result = oxford_degree_facts(url)
+# print("Results:", result)
 
-# Save
-final_df.to_csv('oxford_degree_facts.csv', index=False)
-print("Done!")
\ No newline at end of file
+# mass scraping lives in scrape_all.py (shared fetch pipeline + writer)
+if __name__ == '__main__':
+    import scrape_all
+    scrape_all.main(['oxford'])
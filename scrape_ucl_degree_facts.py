@@ -1,91 +1,82 @@
-import requests
-import lxml.html
-import pandas as pd
 import re
-import time
+
+import telemetry
+from rule_engine import compile_rules
+from scraper_registry import register, DEFAULT_FIELDS
 
 
 # janitor duty 
 
-# def extract_degree_type(title):
-#     if not title:
-#         return None
-    
-#     # Capture degree type + any following characters (like "(Econ)")
-#     degree_pattern = r'(BSc |BA |BEng |MEng |MSc |MA |PhD |MPhil |LLB |LLM |MB |MBBS |MD |BDS |DDS |MPharm |PharmD |DVM |JD ).*$'
-#     match = re.search(degree_pattern, title, flags=re.IGNORECASE)
-    
-#     if match:
-#         return match.group(0).strip()  # Return the entire matched portion
-#     else:
-#         return None
+# # Use word boundaries to match complete degree types only
+degree_pattern = re.compile(r'\b(BSc|BA|BEng|MEng|MSc|MA|PhD|MPhil|LLB|LLM|MB|MBBS|MD|BDS|DDS|PharmD|MSCi|MPharm|DVM|BFA|BASc|JD)\b', re.IGNORECASE)
+
 
 def extract_degree_type(title):
     if not title:
         return None
     
-    # Use word boundaries to match complete degree types only
-    degree_pattern = r'\b(BSc|BA|BEng|MEng|MSc|MA|PhD|MPhil|LLB|LLM|MB|MBBS|MD|BDS|DDS|PharmD|MSCi|MPharm|DVM|BFA|BASc|JD)\b'
-    match = re.search(degree_pattern, title, flags=re.IGNORECASE)
+    match = degree_pattern.search(title)
     
     if match:
         return match.group(1)  # Return just the degree type, not everything after
     else:
         return None
     
-    
-# function
 
-def ucl_degree_facts(url):
-    try:
-        html = requests.get(url, timeout=15).text
-        doc = lxml.html.fromstring(html)
+# extraction rules, compiled once at import (see rule_engine.py for the format)
 
+ucl_rules = compile_rules({
+    'fields': {
         # title + type
-
-        degree_title_results = doc.xpath('//h1/text()')
-        if degree_title_results:
-            title = degree_title_results[0]  
-            degree_type = extract_degree_type(title)  
-            
-            if degree_type:
-                clean_title = title.replace(degree_type, '').strip() 
-            else:
-                clean_title = title
-        else:
-            clean_title = None
-            degree_type = None
-        
-        
-        
+        'title_text': {'xpath': '//h1/text()'},
+        'degree_type': {'from': 'title_text', 'call': extract_degree_type},
+        'degree_title': {'from': 'title_text', 'remove': {'field': 'degree_type'}},
+    },
+    'sections': [
         # a level
-
-        ## grades
-
-        a_level_grade_results = doc.xpath('//*[@id="tab1-alevel"]/div/dl[1]/dd[1]/text()')
-        a_level_grade_req = a_level_grade_results[0] if a_level_grade_results else None
-        
-        ## subjects
-
-        a_level_subject_reqs = doc.xpath('normalize-space(string(//*[@id="tab1-alevel"]/div/dl[1]/dd[2]))')
-    
+        {
+            'name': 'a level',
+            'xpath': '//*[@id="tab1-alevel"]',
+            'fields': {
+                'a_level_grade_req': {'xpath': 'div/dl[1]/dd[1]/text()'},                           ## grades
+                'a_level_subject_reqs': {'xpath': 'normalize-space(string(div/dl[1]/dd[2]))'},       ## subjects
+            },
+        },
         # ib
+        {
+            'name': 'ib',
+            'xpath': '//*[@id="tab2-ibdiploma"]',
+            'fields': {
+                'ib_grade_req': {'xpath': 'div/dl[1]/dd[1]/text()'},                                ## grades
+                'ib_subject_req': {'xpath': 'div/dl[1]/dd[2]/text()'},                              ## subjects
+            },
+        },
+    ],
+    'regions': [
+        {'tag': 'h1'},
+        {'attr': 'id="tab1-alevel"'},
+        {'attr': 'id="tab2-ibdiploma"'},
+    ],
+})
 
-        ## grades
 
-        ib_grade_results = doc.xpath('//*[@id="tab2-ibdiploma"]/div/dl[1]/dd[1]/text()')
-        ib_grade_req = ib_grade_results[0] if ib_grade_results else None
-
-        ## subjects
-
-        ib_subjects_results = doc.xpath('//*[@id="tab2-ibdiploma"]/div/dl[1]/dd[2]/text()')
-        ib_subject_req = ib_subjects_results[0] if ib_subjects_results else None
-
-    # return
+# function
 
-        return [degree_type, clean_title, a_level_grade_req, a_level_subject_reqs, ib_grade_req, ib_subject_req]
+@register('ucl', 'University College London', 'ucl_links_discuni.csv', 'ucl_degree_facts.csv',
+          sitemap='https://www.ucl.ac.uk/prospective-students/undergraduate/sitemap.xml',
+          course_pattern=r'^https://www\.ucl\.ac\.uk/prospective-students/undergraduate/degrees/[a-z0-9-]+/?$',
+          ukprn='10007784', rules=ucl_rules)
+def ucl_degree_facts(url, html=None):
+    try:
+        if html is None:
+            import crawl_engine  # only for a standalone fetch - keeps asyncio/requests out of parse workers
+            html = crawl_engine.fetch_html(url)
+        facts = ucl_rules.facts(html)
+        return [facts[field] for field in DEFAULT_FIELDS]
 
     except Exception as e:
+        print(f"Error scraping {url}: {e}")
+        telemetry.note_error(e)
         return [None, None, None, None, None, None]
 
 
@@ -100,27 +91,7 @@ def ucl_degree_facts(url):
 # result = ucl_degree_facts(url)
 # print(result)
 
-# mass links!
-
-
-df2 = pd.read_csv("https://raw.githubusercontent.com/Danjones-DJ/Degree-Matchmaker_DJ/refs/heads/main/ucl_links_discuni.csv")
-
-results = []
-for index, row in df2.iterrows():  # Changed: iterate over rows to get both columns
-    url = row['crseurl']
-    kis_course_id = row['kiscourseid']  # Get the kiscourseid (lowercase)
-    
-    print(f"Scraping: {url}")
-    facts = ucl_degree_facts(url)
-    
-    # Include both kiscourseid and URL in results
-    results.append([kis_course_id, url] + facts)
-    time.sleep(1)
-
-# Create dataframe with kiscourseid as first column
-columns = ['kiscourseid', 'url', 'degree_type', 'degree_title', 'a_level_grade_req', 'a_level_subject_reqs', 'ib_grade_req', 'ib_subject_req']
-final_df = pd.DataFrame(results, columns=columns)
-
-# Save
-final_df.to_csv('ucl_degree_facts.csv', index=False)
-print("Done!")
+# mass scraping lives in scrape_all.py (shared fetch pipeline + writer)
+if __name__ == '__main__':
+    import scrape_all
+    scrape_all.main(['ucl'])
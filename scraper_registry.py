@@ -0,0 +1,79 @@
+import importlib
+from collections import namedtuple
+
+
+# every university's rows are mapped onto this one record schema.
+# each extractor declares which of these fields it returns (in order), and the
+# writer keeps just those columns so the per-university csvs look as before
+
+RECORD_COLUMNS = [
+    'kiscourseid', 'url', 'degree_type', 'optional_degree_type', 'degree_title',
+    'a_level_grade_req', 'a_level_subject_reqs', 'ib_grade_req', 'ib_subject_req'
+]
+
+DEFAULT_FIELDS = [
+    'degree_type', 'degree_title', 'a_level_grade_req', 'a_level_subject_reqs', 'ib_grade_req', 'ib_subject_req'
+]
+
+# the modules whose @register calls fill UNIVERSITIES. importing them does no
+# i/o and pulls in nothing heavier than lxml, so pool workers start quickly
+EXTRACTOR_MODULES = [
+    'scrape_cam_degree_facts', 'scrape_lse_degree_facts', 'scrape_oxford_degree_facts', 'scrape_ucl_degree_facts'
+]
+
+LINKS_BASE = "https://raw.githubusercontent.com/Danjones-DJ/Degree-Matchmaker_DJ/refs/heads/main/"
+
+# sitemap / course_pattern: where sitemap_discovery.py finds the course pages (a regex over the urls)
+# ukprn: the provider's UK provider reference number, which discover_uni.py selects courses by
+# rules: the extractor's RuleSet - its fingerprint() lets crawl_engine.py reuse rows for unchanged requirements
+University = namedtuple('University', ['key', 'name', 'links_url', 'output', 'fields', 'extractor', 'sitemap', 'course_pattern',
+                                       'ukprn', 'rules'],
+                        defaults=[None, None, None, None])
+
+UNIVERSITIES = {}
+
+
+def register(key, name, links, output, fields=DEFAULT_FIELDS, sitemap=None, course_pattern=None, ukprn=None,
+             rules=None):
+    # decorator for a *_degree_facts(url, html=None) extractor
+    def decorator(extractor):
+        UNIVERSITIES[key] = University(key, name, LINKS_BASE + links, output, list(fields), extractor,
+                                       sitemap, course_pattern, ukprn, rules)
+        return extractor
+    return decorator
+
+
+def load_extractors():
+    for module in EXTRACTOR_MODULES:
+        importlib.import_module(module)
+    return UNIVERSITIES
+
+
+def register_slot(key, name, output, fields=DEFAULT_FIELDS, ukprn=None):
+    # a university we have data for but no scraper yet
+    UNIVERSITIES[key] = University(key, name, None, output, list(fields), None, ukprn=ukprn)
+
+
+def to_record(university, kis_course_id, url, facts):
+    record = dict.fromkeys(RECORD_COLUMNS)
+    record['kiscourseid'] = kis_course_id
+    record['url'] = url
+    record.update(zip(university.fields, facts))
+    return record
+
+
+def output_columns(university):
+    return ['kiscourseid', 'url'] + university.fields
+
+
+def course_keys(df):
+    # kiscourseids are only unique within a provider, so in the combined dataset a course is
+    # 'University of Cambridge:<kiscourseid>' (app.R pastes the same); a single university's csv keeps the bare id
+    ids = df['kiscourseid'].astype(str)
+    if 'university_name' not in df.columns:
+        return ids.tolist()
+    return (df['university_name'].fillna('').astype(str) + ':' + ids).tolist()
+
+
+# imperial_degree_facts.csv exists but was built by hand
+register_slot('imperial', 'Imperial College London', 'imperial_degree_facts.csv', ukprn='10003270')
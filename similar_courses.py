@@ -0,0 +1,109 @@
+import argparse
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+from normalise_grades import add_grade_columns
+from scraper_registry import course_keys
+
+
+# precomputed "similar courses" for the course details modal
+#
+# app.R's find_similar_courses compares the clicked course's title with every
+# other title on each modal open. the rules are the same here, but the titles
+# are tokenised once into a sparse token -> courses index, so each course only
+# looks at the courses sharing a token or compound term with it:
+#   - a course never matches a course with the same title
+#   - only courses with the same or a lower grade_score (or none) qualify
+#   - titles match on a shared compound ("data science", ...) or any shared word
+#   - ranked by how close the grade_score is, then dataset order
+#
+# courses are keyed 'university_name:kiscourseid' (scraper_registry.course_keys) - kis ids repeat across providers
+#
+#   python similar_courses.py golden_triangle_dataset_v2.csv   -> similar_courses.json {course key: [course key, ...]}
+
+DEFAULT_OUTPUT = 'similar_courses.json'
+DEFAULT_TOP_K = 10
+
+# same lists as find_similar_courses in app.R
+SCIENCE_COMPOUNDS = ["data science", "social sciences", "computer science", "political science",
+                     "life sciences", "physical sciences", "natural sciences", "environmental sciences"]
+STOP_WORDS = {"and", "with", "the", "of", "in", "for", "to", "bsc", "ba", "msc", "ma", "meng", "beng",
+              "science", "sciences"}
+
+non_letters = re.compile(r'[^a-z ]')
+
+
+def title_terms(title):
+    # -> (compounds, words) for one title
+    title = str(title).lower()
+    compounds = {compound for compound in SCIENCE_COMPOUNDS if compound in title}
+    words = {word for word in non_letters.sub(' ', title).split() if word not in STOP_WORDS and len(word) > 2}
+    return compounds, words
+
+
+def build_term_index(titles):
+    # sparse term -> course positions; compounds and words share one index
+    index = {}
+    for position, title in enumerate(titles):
+        compounds, words = title_terms(title)
+        for term in compounds | words:
+            index.setdefault(term, []).append(position)
+    return {term: np.array(positions) for term, positions in index.items()}
+
+
+def top_similar(df, top_k=DEFAULT_TOP_K, title_column=None):
+    # -> {course key: [similar course keys, best first]}
+    if title_column is None:
+        title_column = 'title' if 'title' in df.columns else 'degree_title'
+    if 'grade_score' not in df.columns:
+        df = add_grade_columns(df)
+
+    titles = df[title_column].fillna('').astype(str).to_numpy()
+    scores = pd.to_numeric(df['grade_score'], errors='coerce').to_numpy(dtype=float)
+    ids = np.array(course_keys(df), dtype=object)
+    index = build_term_index(titles)
+
+    similar = {}
+    for position, title in enumerate(titles):
+        compounds, words = title_terms(title)
+        postings = [index[term] for term in compounds | words]
+        if not postings:
+            similar[ids[position]] = []
+            continue
+        candidates = np.unique(np.concatenate(postings))
+        candidates = candidates[titles[candidates] != title]
+
+        score = scores[position]
+        if not np.isnan(score):
+            candidate_scores = scores[candidates]
+            candidates = candidates[np.isnan(candidate_scores) | (candidate_scores <= score)]
+            # closest grade first; courses without a score last; ties keep dataset order
+            distance = np.abs(scores[candidates] - score)
+            distance[np.isnan(distance)] = np.inf
+            candidates = candidates[np.argsort(distance, kind='stable')]
+
+        similar[ids[position]] = ids[candidates[:top_k]].tolist()
+    return similar
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute the similar courses shown in the course details")
+    parser.add_argument('input', help="dataset csv with kiscourseid, a title column and a_level_grade_req")
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help="similar courses kept per course")
+    parser.add_argument('--title-column', default=None, help="default: title, else degree_title")
+    parser.add_argument('--out', default=DEFAULT_OUTPUT, help="json file to write")
+    args = parser.parse_args(argv)
+
+    df = pd.read_csv(args.input, dtype=str, keep_default_na=False, na_values=[''])
+    similar = top_similar(df, args.top_k, args.title_column)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(similar, f, separators=(',', ':'))
+    found = sum(1 for courses in similar.values() if courses)
+    print(f"Wrote similar courses for {found} of {len(similar)} courses -> {args.out}")
+
+
+if __name__ == '__main__':
+    main()
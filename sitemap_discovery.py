@@ -0,0 +1,230 @@
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import re
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from lxml import etree
+
+from scraper_registry import UNIVERSITIES, load_extractors
+
+
+# course discovery from each university's sitemap
+#
+# the links csvs on GitHub are maintained by hand, so new or renamed courses
+# are missed until someone edits them, and every listed url is fetched on
+# every run. this reads the sitemap instead, keeps the urls that look like
+# course pages (University.course_pattern), and reconciles them with the
+# links csv:
+#   mapped     in both - kiscourseid from the links csv
+#   renamed    a links url that's gone from the sitemap, whose slug matches a new sitemap url
+#   unmapped   course pages in the sitemap with no kiscourseid yet
+#   missing    links urls that aren't in the sitemap at all
+# the <lastmod> of every page we scraped is remembered, so the next run only
+# schedules pages that are new or have a newer lastmod.
+#
+#   python sitemap_discovery.py                  -> reconciliation report for every university
+#   python sitemap_discovery.py ucl --out new.csv -> also write the unmapped course pages
+
+DEFAULT_STATE = os.path.join('.scrape_cache', 'sitemap_state.json')
+DEFAULT_TIMEOUT = 30
+
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+# "…/degrees/economics-bsc-2025" and "…/degrees/economics-bsc" are the same course
+year_suffix = re.compile(r'-20\d\d(?:-\d\d)?$')
+
+
+def normalise_url(url):
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, '', ''))
+
+
+def slug(url):
+    return year_suffix.sub('', urlsplit(url).path.rstrip('/').rsplit('/', 1)[-1].lower())
+
+
+def parse_lastmod(value):
+    # W3C datetime ("2024-05-01", "2024-05-01T10:00:00+01:00") -> unix time, None if missing/bad
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def read_sitemap(url, session, seen=None):
+    # -> [(loc, lastmod)], following <sitemapindex> children
+    seen = set() if seen is None else seen
+    if url in seen:
+        return []
+    seen.add(url)
+
+    response = session.get(url, timeout=DEFAULT_TIMEOUT)
+    response.raise_for_status()
+    content = response.content
+    if content[:2] == b'\x1f\x8b':
+        content = gzip.decompress(content)
+
+    entries = []
+    children = []
+    for _, element in etree.iterparse(io.BytesIO(content), events=('end',), tag=(SITEMAP_NS + 'url', SITEMAP_NS + 'sitemap')):
+        loc = element.findtext(SITEMAP_NS + 'loc')
+        lastmod = element.findtext(SITEMAP_NS + 'lastmod')
+        if loc:
+            if element.tag == SITEMAP_NS + 'sitemap':
+                children.append(loc.strip())
+            else:
+                entries.append((loc.strip(), lastmod))
+        element.clear()
+
+    for child in children:
+        entries += read_sitemap(child, session, seen)
+    return entries
+
+
+def discover(university, session):
+    # -> {normalised url: (url, lastmod)} for the university's course pages
+    pattern = re.compile(university.course_pattern)
+    pages = {}
+    for loc, lastmod in read_sitemap(university.sitemap, session):
+        if pattern.search(loc):
+            pages[normalise_url(loc)] = (loc, lastmod)
+    return pages
+
+
+def reconcile(links, pages):
+    # links: [(kiscourseid, url)] from the links csv; pages: discover() output
+    by_url = {normalise_url(url): (kis, url) for kis, url in links}
+    mapped = [(kis, pages[key][0]) for key, (kis, _) in by_url.items() if key in pages]
+    unmapped = {key: page for key, page in pages.items() if key not in by_url}
+    gone = [(kis, url) for key, (kis, url) in by_url.items() if key not in pages]
+
+    by_slug = {}
+    for key, (url, _) in unmapped.items():
+        by_slug.setdefault(slug(url), []).append(key)
+
+    renamed, missing = [], []
+    for kis, url in gone:
+        candidates = by_slug.get(slug(url), [])
+        if len(candidates) == 1:
+            key = candidates[0]
+            renamed.append((kis, url, unmapped.pop(key)[0]))
+            by_slug[slug(url)] = []
+        else:
+            missing.append((kis, url))
+
+    return {
+        'mapped': mapped,
+        'renamed': renamed,
+        'unmapped': [url for url, _ in unmapped.values()],
+        'missing': missing,
+    }
+
+
+def load_state(path=DEFAULT_STATE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state, path=DEFAULT_STATE):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def is_due(url, lastmod, state):
+    # new pages, pages without a lastmod and pages with a newer lastmod get fetched
+    seen = state.get(normalise_url(url))
+    modified = parse_lastmod(lastmod)
+    return seen is None or modified is None or modified > seen
+
+
+def schedule(university, links, state, session=None):
+    # -> (links to scrape with renamed urls swapped in, {url: lastmod} for the due ones, report)
+    # if the sitemap can't be read everything is due, as before
+    session = session or requests.Session()
+    try:
+        pages = discover(university, session)
+    except (requests.RequestException, etree.XMLSyntaxError) as e:
+        print(f"Couldn't read the sitemap for {university.name} ({e}) - fetching every course")
+        return links, {}, None
+
+    report = reconcile(links, pages)
+    current = {kis: url for kis, url in report['mapped']}
+    current.update({kis: new_url for kis, _, new_url in report['renamed']})
+
+    scheduled, due = [], {}
+    for kis, url in links:
+        url = current.get(kis, url)
+        lastmod = pages.get(normalise_url(url), (url, None))[1]
+        scheduled.append((kis, url))
+        if kis not in current or is_due(url, lastmod, state):
+            due[url] = lastmod
+    return scheduled, due, report
+
+
+def remember(state, fetched):
+    # fetched: {url: lastmod} of pages scraped successfully
+    for url, lastmod in fetched.items():
+        modified = parse_lastmod(lastmod)
+        if modified is not None:
+            state[normalise_url(url)] = modified
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconcile the universities' sitemaps with the links csvs")
+    parser.add_argument('universities', nargs='*', help="default: every university with a sitemap")
+    parser.add_argument('--state', default=DEFAULT_STATE, help="lastmods of the pages already scraped")
+    parser.add_argument('--out', default=None, help="write unmapped course pages to this csv")
+    args = parser.parse_args(argv)
+
+    from scrape_all import load_links  # scrape_all imports this module, so not at the top
+
+    load_extractors()  # registers the scrapers and their sitemaps
+    keys = args.universities or sorted(key for key, university in UNIVERSITIES.items() if university.sitemap)
+    state = load_state(args.state)
+    session = requests.Session()
+    unmapped_rows = []
+    for key in keys:
+        university = UNIVERSITIES[key]
+        if not university.sitemap:
+            print(f"{university.name}: no sitemap registered")
+            continue
+        links = load_links(university)
+        _, due, report = schedule(university, links, state, session)
+        if report is None:
+            continue
+        print(f"{university.name}: {len(report['mapped'])} mapped, {len(report['renamed'])} renamed, "
+              f"{len(report['unmapped'])} unmapped, {len(report['missing'])} missing - {len(due)} due")
+        for kis, old, new in report['renamed']:
+            print(f"  renamed {kis}: {old} -> {new}")
+        for kis, url in report['missing']:
+            print(f"  missing {kis}: {url}")
+        unmapped_rows += [(key, url) for url in report['unmapped']]
+
+    if args.out:
+        with open(args.out, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(['university', 'url'])
+            writer.writerows(unmapped_rows)
+        print(f"Wrote {len(unmapped_rows)} unmapped course pages to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
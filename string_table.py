@@ -0,0 +1,163 @@
+import argparse
+import gzip
+import json
+import os
+import re
+import time
+
+import pandas as pd
+
+from checkpoint_output import write_csv_atomic
+from normalise_grades import csv_rows
+
+
+# shared string table for the long requirement texts
+#
+# cambridge writes the same subject paragraph twice per row ("A*AA - ..." in
+# a_level_subject_reqs, "41 points - ..." in ib_subject_req) and lots of
+# courses share text like "No specific subjects required". this splits the
+# grade / points prefix into its own column and replaces the text with an id
+# into one table of distinct strings (requirement_strings.json), shared by
+# both columns:
+#   a_level_subject_reqs  -> a_level_subject_reqs_grade ('A*AA') + a_level_subject_reqs_id
+#   ib_subject_req        -> ib_subject_req_points (41)       + ib_subject_req_id
+# restore_requirements() puts the original text back exactly; with_texts() does
+# that for a dataset read from disk, so the tools that search the text
+# (subject_index.py, course_matcher.py) take either form.
+#
+#   python string_table.py golden_triangle_dataset.csv   -> size / load time before and after
+#   python build_dataset.py --intern                     -> writes the dataset this way
+
+DEFAULT_TABLE = 'requirement_strings.json'
+
+# column -> (prefix column, pattern splitting prefix / text, what followed the prefix value)
+REQUIREMENT_COLUMNS = {
+    'a_level_subject_reqs': ('a_level_subject_reqs_grade', re.compile(r'(?s)^((?:A\*|[A-E]){2,5})(?: - (.*))?$'), ''),
+    'ib_subject_req': ('ib_subject_req_points', re.compile(r'(?s)^(\d{2}) points(?: - (.*))?$'), ' points'),
+}
+
+
+def intern_requirements(df, strings=None):
+    # -> (df with prefix + id columns in place of the texts, list of distinct strings)
+    # strings: an existing table to extend, so ids stay stable between builds
+    strings = list(strings or [])
+    ids = {text: i for i, text in enumerate(strings)}
+    df = df.copy()
+    for column, (prefix_column, pattern, _) in REQUIREMENT_COLUMNS.items():
+        if column not in df.columns:
+            continue
+        text = df[column].astype('string')
+        parts = text.str.extract(pattern)
+        matched = parts[0].notna()
+        body = text.where(~matched, parts[1])
+        codes = [pd.NA if pd.isna(value) else ids.setdefault(value, len(ids)) for value in body]
+
+        at = df.columns.get_loc(column)
+        df = df.drop(columns=column)
+        prefix = parts[0]
+        if prefix_column.endswith('_points'):
+            prefix = pd.to_numeric(prefix, errors='coerce').astype('Int16')
+        df.insert(at, prefix_column, prefix)
+        df.insert(at + 1, column + '_id', pd.array(codes, dtype='Int32'))
+    strings += list(ids)[len(strings):]
+    return df, strings
+
+
+def restore_requirements(df, strings):
+    # inverse of intern_requirements
+    df = df.copy()
+    table = pd.Series(list(strings) + [pd.NA], dtype='string')
+    for column, (prefix_column, _, suffix) in REQUIREMENT_COLUMNS.items():
+        if column + '_id' not in df.columns:
+            continue
+        codes = df[column + '_id'].astype('Int32').fillna(len(strings)).astype(int)
+        body = pd.Series(table.values[codes.values], index=df.index, dtype='string')
+        prefix = df[prefix_column].astype('string') + suffix
+        text = (prefix + ' - ' + body).fillna(prefix).fillna(body)
+
+        at = df.columns.get_loc(prefix_column)
+        df = df.drop(columns=[prefix_column, column + '_id'])
+        df.insert(at, column, text)
+    return df
+
+
+def with_texts(df, path):
+    # a dataset read from `path` with its requirement texts back, if it was written with --intern
+    if not any(column + '_id' in df.columns for column in REQUIREMENT_COLUMNS):
+        return df
+    table = table_path(path)
+    if not os.path.exists(table):
+        raise FileNotFoundError(f"{path} has interned requirement texts but there is no {table} next to it")
+    return restore_requirements(df, read_table(table))
+
+
+def read_table(path=DEFAULT_TABLE):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_table(strings, path=DEFAULT_TABLE):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(strings, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def table_path(output):
+    # the string table sits next to the dataset it belongs to
+    return os.path.join(os.path.dirname(output), DEFAULT_TABLE)
+
+
+def sizes(path):
+    # -> (bytes on disk, bytes gzipped - roughly what the app downloads)
+    with open(path, 'rb') as f:
+        data = f.read()
+    return len(data), len(gzip.compress(data))
+
+
+def load_time(read, rounds=20):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        df = read()
+    return (time.perf_counter() - started) / rounds * 1000, df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare a dataset csv with its requirement texts interned")
+    parser.add_argument('input', help="dataset csv with a_level_subject_reqs / ib_subject_req")
+    parser.add_argument('--out', default=None, help="also write the interned csv here (table goes next to it)")
+    args = parser.parse_args(argv)
+
+    read = lambda path: pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[''])
+    df = read(args.input)
+    interned, strings = intern_requirements(df)
+    if not restore_requirements(interned, strings).fillna('').astype(str).equals(df.fillna('').astype(str)):
+        raise SystemExit("round trip changed the data - not writing anything")
+
+    out = args.out or os.path.join('.scrape_cache', 'interned_' + os.path.basename(args.input))
+    if os.path.dirname(out):
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+    write_csv_atomic(out, list(interned.columns), csv_rows(interned))
+    write_table(strings, table_path(out))
+
+    texts = sum(df[column].notna().sum() for column in REQUIREMENT_COLUMNS if column in df.columns)
+    print(f"{texts} requirement texts -> {len(strings)} distinct strings")
+    print(f"{'':<10} {'csv KB':>8} {'gzip KB':>8} {'load ms':>8} {'memory KB':>10}")
+    text_ms, text_df = load_time(lambda: read(args.input))
+    interned_ms, (ids_df, table) = load_time(lambda: (read(out), read_table(table_path(out))))
+    raw, zipped = sizes(args.input)
+    print(f"{'text':<10} {raw / 1024:>8.1f} {zipped / 1024:>8.1f} {text_ms:>8.2f} "
+          f"{text_df.memory_usage(deep=True).sum() / 1024:>10.1f}")
+    # interned = the csv plus its string table, both read; texts looked up by id when shown
+    raw, zipped = (a + b for a, b in zip(sizes(out), sizes(table_path(out))))
+    memory = ids_df.memory_usage(deep=True).sum() + pd.Series(table, dtype=object).memory_usage(deep=True)
+    print(f"{'interned':<10} {raw / 1024:>8.1f} {zipped / 1024:>8.1f} {interned_ms:>8.2f} {memory / 1024:>10.1f}")
+    restore_ms, _ = load_time(lambda: restore_requirements(ids_df, table))
+    print(f"restoring every text up front would add {restore_ms:.2f} ms")
+    print(f"Wrote {out} and {table_path(out)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+import argparse
+import json
+import re
+
+import pandas as pd
+
+from scraper_registry import course_keys
+from string_table import with_texts
+
+
+# subject -> courses inverted index, built once from the scraped requirement text
+#
+# app.R's match_subjects_with_requirements rebuilds the synonym list and greps
+# every synonym against every course on each submit. this resolves the same
+# synonym table once and writes, per subject, the sorted ids of the courses
+# whose requirements ask for it ("required") or just name it ("mentioned"),
+# so matching at query time is a set lookup. an id is a position in 'courses',
+# which names each course by university and kiscourseid (scraper_registry.course_keys).
+# unlike the app's grepl, synonyms match as whole words ("Art" isn't found in
+# "Martial") and the IB requirement text is searched as well as the A-level one.
+# only the synonym table's subjects are indexed unless --subjects adds the rest;
+# app.R falls back to its substring match for any subject the index doesn't have.
+#
+#   python subject_index.py golden_triangle_dataset.csv            -> subject_index.json
+#   python subject_index.py data.csv --subjects alevel_subjects.csv -> also index subjects without synonyms
+
+DEFAULT_OUTPUT = 'subject_index.json'
+TEXT_COLUMNS = ['a_level_subject_reqs', 'ib_subject_req']
+
+# same table as create_subject_synonyms() in app.R
+SUBJECT_SYNONYMS = {
+    "Mathematics": ["Mathematics", "Maths", "Math", "Mathematical", "Further Mathematics", "Statistics"],
+    "Physics": ["Physics", "Physical", "Physical Sciences"],
+    "Chemistry": ["Chemistry", "Chemical", "Chemical Sciences"],
+    "Biology": ["Biology", "Biological", "Biological Sciences", "Life Sciences", "Life and Health Sciences"],
+    "English Literature": ["English Literature", "English", "Literature", "English Language and Literature"],
+    "English Language": ["English Language", "English", "Language", "English Language and Literature"],
+    "History": ["History", "Historical", "Ancient History"],
+    "Geography": ["Geography", "Geographical", "Environmental Geography"],
+    "Computer Science": ["Computer Science", "Computing", "ICT", "Information Technology", "Software Systems Development"],
+    "Economics": ["Economics", "Economic", "Business Economics"],
+    "Psychology": ["Psychology", "Psychological"],
+    "Art and Design": ["Art and Design", "Art", "Design", "Fine Art", "Visual Arts"],
+    "Business": ["Business", "Business Studies", "Commerce"],
+    "French": ["French", "French Language", "French Studies"],
+    "German": ["German", "German Language", "German Studies"],
+    "Spanish": ["Spanish", "Spanish Language", "Spanish Studies"],
+    "Politics": ["Politics", "Political Science", "Government", "Government and Politics"],
+    "Philosophy": ["Philosophy", "Philosophical"],
+    "Sociology": ["Sociology", "Social Sciences", "Sociological"],
+    "Drama": ["Drama", "Theatre", "Drama and Theatre", "Performing Arts"],
+    "Music": ["Music", "Musical", "Music Technology"],
+    "Physical Education": ["Physical Education", "PE", "Sports", "Sports Science"],
+    "Religious Studies": ["Religious Studies", "Religion", "Theology", "Islamic Studies", "Biblical Studies"],
+    "Media Studies": ["Media Studies", "Media", "Film Studies", "Digital Media and Design"],
+    "Law": ["Law", "Legal Studies", "Jurisprudence"],
+}
+
+# requirement text is split into clauses; a subject named in a clause with a
+# soft word is only "mentioned", one named in any other clause is "required"
+# (e.g. "A* in Mathematics; A in Physics" vs "Further Mathematics is desirable")
+clause_split = re.compile(r'[;.\n]|\bwe also recommend\b', re.IGNORECASE)
+soft_words = re.compile(
+    r'\b(?:recommend\w*|desirable|useful|helpful|prefer\w*|advantage\w*|encourag\w*|consider\w*|'
+    r'not required|not needed|no specific|not essential|optional)\b',
+    re.IGNORECASE
+)
+
+
+def subject_pattern(synonyms):
+    # longest first, whole words only, case-insensitive
+    alternatives = sorted({re.escape(synonym) for synonym in synonyms}, key=len, reverse=True)
+    return re.compile(r'\b(?:' + '|'.join(alternatives) + r')\b', re.IGNORECASE)
+
+
+def compile_subjects(extra_subjects=()):
+    patterns = {subject: subject_pattern(synonyms) for subject, synonyms in SUBJECT_SYNONYMS.items()}
+    for subject in extra_subjects:
+        if subject and subject not in patterns:
+            patterns[subject] = subject_pattern([subject])
+    return patterns
+
+
+def classify(text, patterns):
+    # -> {subject: 'required' | 'mentioned'} for every subject named in text
+    found = {}
+    for clause in clause_split.split(text):
+        if not clause.strip():
+            continue
+        soft = soft_words.search(clause) is not None
+        for subject, pattern in patterns.items():
+            if pattern.search(clause):
+                if not soft:
+                    found[subject] = 'required'
+                else:
+                    found.setdefault(subject, 'mentioned')
+    return found
+
+
+def build_index(df, extra_subjects=()):
+    patterns = compile_subjects(extra_subjects)
+    courses = course_keys(df)
+    index = {subject: {'required': [], 'mentioned': []} for subject in patterns}
+
+    columns = [column for column in TEXT_COLUMNS if column in df.columns]
+    if not columns:
+        # e.g. an interned dataset (build_dataset.py --intern) - string_table.with_texts puts the text back
+        raise ValueError(f"no requirement text to index: none of {', '.join(TEXT_COLUMNS)} in the dataset")
+    texts = df[columns].fillna('').astype(str).agg(' ; '.join, axis=1)
+    for course_id, text in enumerate(texts):
+        for subject, kind in classify(text, patterns).items():
+            index[subject][kind].append(course_id)   # ids go in ascending order
+
+    return {'courses': courses, 'subjects': index}
+
+
+def courses_for(index, subjects, required_only=False):
+    # union over the selected subjects -> sorted course ids
+    found = set()
+    for subject in subjects:
+        entry = index['subjects'].get(subject)
+        if entry is None:
+            continue
+        found.update(entry['required'])
+        if not required_only:
+            found.update(entry['mentioned'])
+    return sorted(found)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the subject -> courses index from requirement text")
+    parser.add_argument('input', help="dataset csv with kiscourseid and requirement columns")
+    parser.add_argument('--subjects', default=None, help="csv with an a_level_subjects column to index as well")
+    parser.add_argument('--out', default=DEFAULT_OUTPUT, help="json file to write")
+    args = parser.parse_args(argv)
+
+    df = with_texts(pd.read_csv(args.input, dtype=str, keep_default_na=False, na_values=['']), args.input)
+    extra = pd.read_csv(args.subjects, dtype=str)['a_level_subjects'].dropna().tolist() if args.subjects else []
+    index = build_index(df, extra)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(index, f, separators=(',', ':'))
+    indexed = sum(1 for entry in index['subjects'].values() if entry['required'] or entry['mentioned'])
+    print(f"Indexed {len(index['courses'])} courses across {indexed} subjects -> {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+import contextlib
+import functools
+import json
+import os
+import socket
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+
+# per-url fetch / parse telemetry for scrape_all.py
+#
+# one json line per page in <run>.jsonl:
+#   url, source, host, status, bytes, not_modified
+#   dns_ms, connect_ms (tcp + tls), ttfb_ms, fetch_ms     - dns/connect only on a new connection
+#   parse_ms, sliced, probed (the slice was checked against the raw page), steps {rule: ms}, matched [section names]
+#   memo (hit / miss: the row came from the requirements memo, or had to be extracted)
+#   empty_fields, error_class, error
+# and a summary at the end of the run: throughput, latency percentiles per
+# host, the slowest pages, error classes, and how often each field came out
+# empty or each section layout matched.
+#
+#   python scrape_all.py --telemetry                  -> .scrape_cache/telemetry/<time>.jsonl
+#   python telemetry.py .scrape_cache/telemetry/x.jsonl   -> summary of an earlier run
+
+DEFAULT_DIRECTORY = os.path.join('.scrape_cache', 'telemetry')
+SLOWEST = 10
+
+_local = threading.local()
+
+
+# --- fetch timings: a requests adapter whose connections time dns and connect
+
+def _stats():
+    return getattr(_local, 'stats', None)
+
+
+class _TimedConnection:
+    def _new_conn(self):
+        stats = _stats()
+        if stats is None:
+            return super()._new_conn()
+        started = time.perf_counter()
+        try:
+            address = socket.getaddrinfo(self._dns_host, self.port, 0, socket.SOCK_STREAM)[0][4][0]
+        except OSError:
+            return super()._new_conn()   # let urllib3 raise its usual error
+        stats['dns_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        # connect to the address we just resolved, not the name (tls still checks the name)
+        name, self._dns_host = self._dns_host, address
+        try:
+            return super()._new_conn()
+        except Exception:
+            self._dns_host = name
+            return super()._new_conn()
+        finally:
+            self._dns_host = name
+
+    def connect(self):
+        stats = _stats()
+        started = time.perf_counter()
+        super().connect()
+        if stats is not None:
+            stats['connect_ms'] = round((time.perf_counter() - started) * 1000 - stats.get('dns_ms', 0), 3)
+
+
+@functools.lru_cache(maxsize=None)
+def _timed_adapter_class():
+    # built on first use: the extractors import this module for the parse
+    # traces, and parse workers shouldn't pay for importing requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class TimedHTTPConnection(_TimedConnection, HTTPConnection):
+        pass
+
+    class TimedHTTPSConnection(_TimedConnection, HTTPSConnection):
+        pass
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = TimedHTTPConnection
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+
+    class TimedAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+    return TimedAdapter
+
+
+def timed_adapter(**kwargs):
+    # a requests HTTPAdapter whose new connections record dns_ms / connect_ms
+    return _timed_adapter_class()(**kwargs)
+
+
+def timed_get(session, url, stats, **kwargs):
+    # session.get that fills stats with dns_ms, connect_ms, ttfb_ms, fetch_ms and bytes
+    # (fetch_ms is set even when the request fails)
+    _local.stats = stats
+    started = time.perf_counter()
+    try:
+        response = session.get(url, **kwargs)
+        stats['ttfb_ms'] = round(response.elapsed.total_seconds() * 1000
+                                 - stats.get('dns_ms', 0) - stats.get('connect_ms', 0), 3)
+        stats['bytes'] = len(response.content)
+        return response
+    finally:
+        stats['fetch_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        _local.stats = None
+
+
+# --- parse traces: rule_engine notes timings and matches while one is open
+
+def current():
+    return getattr(_local, 'trace', None)
+
+
+@contextlib.contextmanager
+def tracing():
+    trace = {'steps': {}, 'matched': []}
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = None
+
+
+def note_error(error):
+    # for extractors that catch their own exceptions
+    trace = current()
+    if trace is not None:
+        trace['error_class'] = type(error).__name__
+        trace['error'] = str(error)[:300]
+
+
+# --- the run log
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Telemetry:
+    def __init__(self, path=None, fields=None):
+        # fields: {source: [field names]} so empty row values can be named
+        if path is None:
+            path = os.path.join(DEFAULT_DIRECTORY, time.strftime('%Y%m%d-%H%M%S') + '.jsonl')
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.fields = fields or {}
+        self.offset = os.path.getsize(path) if os.path.exists(path) else 0
+        self.file = open(path, 'a', encoding='utf-8')
+        self.started = time.time()
+
+    def page(self, source, page, row, trace):
+        event = {'url': page.url, 'source': source, 'host': urlsplit(page.url).netloc,
+                 'status': page.status, 'not_modified': page.not_modified}
+        event.update(page.stats or {})
+        event.update(trace or {})
+        if page.error is not None:
+            event['error_class'] = type(page.error).__name__
+            event['error'] = str(page.error)[:300]
+        elif page.status is not None and page.status >= 400:
+            event.setdefault('error_class', f'HTTP {page.status}')
+        names = self.fields.get(source) or [str(i) for i in range(len(row))]
+        event['empty_fields'] = [name for name, value in zip(names, row) if value is None]
+        self.record(event)
+
+    def record(self, event):
+        event.setdefault('at', round(time.time(), 3))
+        self.file.write(json.dumps(event) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def summary(self):
+        # read back from the log rather than keeping every event in memory
+        with open(self.path, encoding='utf-8') as f:
+            f.seek(self.offset)
+            events = [json.loads(line) for line in f if line.strip()]
+        return summarise(events, time.time() - self.started)
+
+
+def summarise(events, elapsed=None):
+    if elapsed is None and events:
+        elapsed = max(e['at'] for e in events) - min(e['at'] for e in events)
+    lines = []
+    pages = len(events)
+    total_bytes = sum(e.get('bytes') or 0 for e in events)
+    rate = pages / elapsed if elapsed else 0
+    lines.append(f"{pages} pages, {total_bytes / 1e6:.1f} MB in {elapsed or 0:.1f}s ({rate:.1f} pages/s)")
+
+    by_host = defaultdict(list)
+    for event in events:
+        by_host[event['host']].append(event)
+    lines.append(f"{'host':<36} {'pages':>6} {'errors':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'ttfb p50':>9} {'parse p50':>9}")
+    for host, host_events in sorted(by_host.items()):
+        fetch = [e['fetch_ms'] for e in host_events if e.get('fetch_ms') is not None]
+        ttfb = [e['ttfb_ms'] for e in host_events if e.get('ttfb_ms') is not None]
+        parse = [e['parse_ms'] for e in host_events if e.get('parse_ms') is not None]
+        errors = sum(1 for e in host_events if e.get('error_class'))
+        cells = [percentile(fetch, 50), percentile(fetch, 90), percentile(fetch, 99), percentile(ttfb, 50), percentile(parse, 50)]
+        cells = ['-' if value is None else f"{value:.1f}" for value in cells]
+        lines.append(f"{host:<36} {len(host_events):>6} {errors:>6} {cells[0]:>8} {cells[1]:>8} {cells[2]:>8} {cells[3]:>9} {cells[4]:>9}")
+
+    slowest = sorted(events, key=lambda e: (e.get('fetch_ms') or 0) + (e.get('parse_ms') or 0), reverse=True)[:SLOWEST]
+    if slowest:
+        lines.append("slowest pages (fetch + parse):")
+        for event in slowest:
+            lines.append(f"  {(event.get('fetch_ms') or 0):>8.1f} + {(event.get('parse_ms') or 0):>6.1f} ms  {event['url']}")
+
+    errors = Counter(e['error_class'] for e in events if e.get('error_class'))
+    if errors:
+        lines.append("errors: " + ", ".join(f"{name} x{count}" for name, count in errors.most_common()))
+
+    by_source = defaultdict(list)
+    for event in events:
+        by_source[event['source']].append(event)
+    for source, source_events in sorted(by_source.items()):
+        empty = Counter(name for e in source_events for name in e.get('empty_fields', []))
+        matched = Counter(name for e in source_events for name in e.get('matched', []))
+        memo = Counter(e['memo'] for e in source_events if e.get('memo'))
+        parts = []
+        if memo:
+            parts.append(f"memo {memo['hit']} hits / {memo['miss']} misses")
+        if matched:
+            parts.append("matched " + ", ".join(f"{name} x{count}" for name, count in matched.most_common()))
+        if empty:
+            parts.append("empty " + ", ".join(f"{name} x{count}" for name, count in empty.most_common()))
+        if parts:
+            lines.append(f"{source}: " + "; ".join(parts))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Summarise a telemetry log from scrape_all.py --telemetry")
+    parser.add_argument('path', help="telemetry .jsonl file")
+    args = parser.parse_args(argv)
+    with open(args.path, encoding='utf-8') as f:
+        events = [json.loads(line) for line in f if line.strip()]
+    print(summarise(events))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import http.server
+import threading
+
+import pytest
+
+import crawl_engine
+from page_archive import PageArchive
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    # serves the good page until the test sets `status` to something else
+    status = 200
+
+    def do_GET(self):
+        body = b'<html><h1>Good page</h1></html>' if self.status == 200 else b'<html>Service Unavailable</html>'
+        self.send_response(self.status)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+    Handler.status = 200
+
+
+def crawl_into(archive, url):
+    def archive_page(name, i, page):
+        archive.append(page.url, page.text, source=name)
+    failures = []
+    crawl_engine.scrape_many({'test': ([url], lambda url, html: [html], 1)}, page_hook=archive_page,
+                             on_failure=lambda name, i, page: failures.append(page.status),
+                             retries=0, delay=0, robots=False)
+    return failures
+
+
+@pytest.mark.parametrize('status', [503, 500, 404])
+def test_error_response_does_not_replace_archived_page(server, tmp_path, status):
+    archive = PageArchive(str(tmp_path))
+    url = server + '/courses/physics'
+    assert crawl_into(archive, url) == []
+    Handler.status = status
+    crawl_into(archive, url)
+    assert archive.latest(url) == '<html><h1>Good page</h1></html>'
+    archive.close()
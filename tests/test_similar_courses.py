@@ -0,0 +1,18 @@
+import pandas as pd
+
+from similar_courses import top_similar
+
+
+def test_shared_kiscourseid_keeps_each_providers_neighbours():
+    # KIS ids are only unique within one provider - both universities have a U123
+    df = pd.DataFrame({
+        'university_name': ['University of Cambridge', 'University of Oxford',
+                            'University of Cambridge', 'University of Oxford'],
+        'kiscourseid': ['U123', 'U123', 'C1', 'O1'],
+        'degree_title': ['Computer Science', 'History', 'Computer Science and Mathematics', 'Ancient History'],
+        'a_level_grade_req': ['A*A*A', 'AAA', 'A*AA', 'AAA'],
+    })
+    similar = top_similar(df)
+    assert len(similar) == 4
+    assert similar['University of Cambridge:U123'] == ['University of Cambridge:C1']
+    assert similar['University of Oxford:U123'] == ['University of Oxford:O1']
@@ -0,0 +1,17 @@
+import pandas as pd
+
+from subject_index import build_index, courses_for
+
+
+def test_shared_kiscourseid_only_matches_the_course_that_asks_for_the_subject():
+    # KIS ids are only unique within one provider
+    df = pd.DataFrame({
+        'university_name': ['University of Cambridge', 'University of Oxford'],
+        'kiscourseid': ['U123', 'U123'],
+        'a_level_subject_reqs': ['A*A*A including Mathematics', 'AAA including History'],
+        'ib_subject_req': [None, None],
+    })
+    index = build_index(df)
+    assert index['courses'] == ['University of Cambridge:U123', 'University of Oxford:U123']
+    assert [index['courses'][i] for i in courses_for(index, ['Mathematics'])] == ['University of Cambridge:U123']
+    assert [index['courses'][i] for i in courses_for(index, ['History'])] == ['University of Oxford:U123']